@@ -4,6 +4,8 @@ set -euo pipefail
 cd /app
 mkdir -p /app/state
 
+MAX_WORKERS="${INFERENCE_MAX_WORKERS:-1}"
+
 python3 -m tracker.inference_worker \
   --db ./state/snapshots.sqlite3 \
   --node-bin node \
@@ -12,4 +14,5 @@ python3 -m tracker.inference_worker \
   --extract-experience-py ./job-alert/extract_experience.py \
   --timeout-seconds 120 \
   --poll-sleep-seconds 2 \
+  --max-workers "$MAX_WORKERS" \
   --verbose
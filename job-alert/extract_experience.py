@@ -1,9 +1,22 @@
 import sys
 import json
 import os
+import re
+import argparse
+import asyncio
+import hashlib
+import tempfile
+import time
 from pathlib import Path
+import httpx
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # optional speedup; stdlib json also accepts bytes
+    json_loads = json.loads
+
 SECRETS_FILE = Path(__file__).resolve().parents[1] / "state" / "secrets.env"
 load_dotenv(override=False)
 OPENAI_API_KEY = (os.getenv("OPENAI_API_KEY") or "").strip()
@@ -12,7 +25,7 @@ if not OPENAI_API_KEY and SECRETS_FILE.exists():
     # file to override that empty value.
     load_dotenv(dotenv_path=SECRETS_FILE, override=True)
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 OPENAI_API_KEY = (os.getenv("OPENAI_API_KEY") or "").strip()
 if not OPENAI_API_KEY:
@@ -21,36 +34,38 @@ if not OPENAI_API_KEY:
         f"or put it in {SECRETS_FILE}"
     )
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-SYSTEM_PROMPT = """
-You are an information extraction system.
+# One keep-alive pool per client, shared by every request in the process, so
+# TCP/TLS setup is paid once rather than per job. Sized above --concurrency.
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
 
-Your tasks:
-1) Extract the MINIMUM required years of professional experience from the job description.
-2) Extract the human-readable job title for this role.
+# SDK retries back off on 429/5xx. Set OPENAI_MAX_RETRIES=0 to surface failures
+# straight to the caller (inference_worker retries jobs on nonzero exit).
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
 
-Rules for MINIMUM YEARS:
-- Ignore degrees entirely (BS, MS, PhD).
-- Ignore preferred qualifications unless explicitly required.
-- If multiple experience numbers appear, choose the LOWEST.
-- Do NOT infer years of experience from the job title alone.
-- If entry-level or new grad, return 0.
-- If unclear, return 0.
-- Never guess.
+client = OpenAI(
+    api_key=OPENAI_API_KEY,
+    max_retries=OPENAI_MAX_RETRIES,
+    http_client=httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+)
+aclient = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    max_retries=OPENAI_MAX_RETRIES,
+    http_client=httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+)
 
-Rules for JOB TITLE:
-- Use the main job posting content, not cookie banners, privacy notices, or generic site headers/footers.
-- Ignore phrases like "Do Not Sell or Share My Personal Data", "Cookie Preferences", "Privacy Policy", etc.
-- Prefer the heading that clearly describes the role (for example, an <h1> like "Senior Software Engineer, Machine Learning").
-- The title should be concise and suitable for an email digest.
+MODEL = "gpt-4o-mini"
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
 
-Return ONLY valid JSON:
+# Optional on-disk cache of model answers, e.g. LLM_CACHE_DIR=./state/llm_cache.
+# Safe because requests are deterministic (temperature=0).
+LLM_CACHE_DIR = (os.getenv("LLM_CACHE_DIR") or "").strip()
 
-{
-  "job_title": string,
-  "min_years": number
-}
+SYSTEM_PROMPT = """Extract from the job posting:
+- min_years: minimum REQUIRED years of professional experience. Ignore degrees and preferred-only qualifications. Several numbers -> lowest. Never infer from the title. Entry-level, new grad or unclear -> 0.
+- job_title: concise role title from the main posting (e.g. its <h1>), not cookie/privacy banners or site headers.
+Reply JSON only: {"job_title": string, "min_years": number}
 """
 
 KEYWORDS = [
@@ -62,15 +77,38 @@ KEYWORDS = [
     "minimum",
     "preferred"
 ]
+# One alternation scanned once per line. Matched against lower-cased text:
+# re.IGNORECASE disables the literal-prefix fast paths and is ~5x slower here.
+KEYWORD_RE = re.compile("|".join(re.escape(k) for k in KEYWORDS))
 
 def trim_text(text, max_chars=8000):
-    lines = [l.strip() for l in text.split("\n") if len(l.strip()) > 20]
     keep = []
+    low = text.lower()
 
-    for line in lines:
-        lower = line.lower()
-        if any(k in lower for k in KEYWORDS):
-            keep.append(line)
+    if len(low) == len(text):
+        # Single pass: lower-case once, jump from keyword hit to keyword hit and
+        # slice only those lines out of the original text. Lines without a
+        # keyword are never split off, stripped or lower-cased.
+        pos = 0
+        while True:
+            m = KEYWORD_RE.search(low, pos)
+            if m is None:
+                break
+            start = text.rfind("\n", 0, m.start()) + 1
+            end = text.find("\n", m.end())
+            if end == -1:
+                end = len(text)
+            line = text[start:end].strip()
+            if len(line) > 20:
+                keep.append(line)
+            pos = end + 1
+    else:
+        # A few characters change length when lower-cased, so offsets into low
+        # would not line up with text; fall back to matching line by line.
+        for line in text.split("\n"):
+            line = line.strip()
+            if len(line) > 20 and KEYWORD_RE.search(line.lower()):
+                keep.append(line)
 
     trimmed = "\n".join(keep)
     if len(trimmed) < 500:
@@ -78,24 +116,24 @@ def trim_text(text, max_chars=8000):
 
     return trimmed[:max_chars]
 
-def extract_min_years(job_text, scraped_title=""):
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": (
-                    f"SCRAPED_TITLE: {scraped_title}\n\n"
-                    f"JOB_DESCRIPTION:\n{job_text}"
-                ),
-            },
-        ],
-    )
+def needs_llm(job_text):
+    # Without any experience keyword the model can only answer 0 ("unclear"),
+    # so the call is skipped and the scraped title is kept.
+    return KEYWORD_RE.search(job_text.lower()) is not None
 
-    raw = response.choices[0].message.content
+def build_messages(job_text, scraped_title=""):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": (
+                f"SCRAPED_TITLE: {scraped_title}\n\n"
+                f"JOB_DESCRIPTION:\n{job_text}"
+            ),
+        },
+    ]
 
+def parse_model_output(raw, scraped_title=""):
     try:
         data = json.loads(raw)
     except Exception:
@@ -112,22 +150,412 @@ def extract_min_years(job_text, scraped_title=""):
         "min_years": int(years),
     }
 
-def main():
-    raw_input = sys.stdin.read()
-    data = json.loads(raw_input)
+# --------- response cache ---------
+
+def cache_key(job_text, scraped_title=""):
+    # Length-prefix every field so prompt/title/text boundaries can't collide.
+    h = hashlib.sha256()
+    for part in ("openai", MODEL, SYSTEM_PROMPT, scraped_title, job_text):
+        b = part.encode("utf-8")
+        h.update(len(b).to_bytes(8, "big"))
+        h.update(b)
+    return h.hexdigest()
+
+def cache_path(key):
+    return os.path.join(LLM_CACHE_DIR, key[:2], key + ".json")
+
+def cache_get(key):
+    if not LLM_CACHE_DIR:
+        return None
+    try:
+        with open(cache_path(key), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+def cache_put(key, result):
+    if not LLM_CACHE_DIR:
+        return
+    path = cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"llm_cache_write_failed path={path} error={e}", file=sys.stderr)
+
+class TokenBucket:
+    """
+    Paces API calls to `rate` per second (bursts up to `capacity`) so a
+    burst of jobs stays under the account's RPM instead of hitting 429s.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def take(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def extract_min_years(job_text, scraped_title="", bucket=None):
+    if not needs_llm(job_text):
+        return {"job_title": scraped_title, "min_years": 0}
 
+    key = cache_key(job_text, scraped_title)
+    cached = cache_get(key)
+    if cached is not None:
+        return cached
+
+    if bucket is not None:
+        await bucket.take()
+    response = await aclient.chat.completions.create(
+        model=MODEL,
+        temperature=0,
+        response_format={"type": "json_object"},
+        messages=build_messages(job_text, scraped_title),
+    )
+
+    raw = response.choices[0].message.content
+    result = parse_model_output(raw, scraped_title)
+    cache_put(key, result)
+    return result
+
+def read_job(data):
     title = data.get("job_title", "")
     text = data.get("text", "") or data.get("page_text", "")
+    return title, text
 
-    trimmed = trim_text(text)
-    result = extract_min_years(trimmed, scraped_title=title)
-
-    output = {
+def format_output(result, title):
+    return {
         "job_title": result.get("job_title", title),
         "min_years": int(result.get("min_years", 0) or 0),
     }
 
-    print(json.dumps(output))
+def read_jobs(stream):
+    """
+    Yields jobs from a binary stream holding JSONL or a single JSON object
+    (possibly pretty-printed). JSONL is parsed line by line as it is read,
+    never buffering the whole input.
+    """
+    for first in stream:
+        if first.strip():
+            break
+    else:
+        return
+    try:
+        job = json_loads(first)
+    except ValueError:
+        # The first line is not a whole object: one pretty-printed job.
+        yield json_loads(first + stream.read())
+        return
+    yield job
+    yield from read_jobs_jsonl(stream)
+
+async def extract_jobs(jobs, concurrency=16, rps=0):
+    """
+    Runs all jobs concurrently in this process, at most `concurrency` API
+    calls in flight and, if rps > 0, at most `rps` started per second.
+    Returns (output, error) per job, in input order.
+
+    jobs is consumed lazily: the next job is read only once a slot is free,
+    so at most `concurrency` jobs are held in memory besides the results.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rps) if rps > 0 else None
+    results = []
+    running = set()
+    failed = []
+
+    async def one(i, data):
+        try:
+            title, text = read_job(data)
+            try:
+                result = await extract_min_years(trim_text(text), scraped_title=title, bucket=bucket)
+                results[i] = format_output(result, title), None
+            except Exception as e:
+                results[i] = {"job_title": title, "min_years": 0, "error": str(e)}, e
+        finally:
+            sem.release()
+
+    def done(task):
+        running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            failed.append(task.exception())
+
+    for data in jobs:
+        await sem.acquire()
+        if failed:
+            sem.release()
+            break
+        results.append(None)
+        task = asyncio.create_task(one(len(results) - 1, data))
+        running.add(task)
+        task.add_done_callback(done)
+
+    await asyncio.gather(*running, return_exceptions=True)
+    # A malformed job (read_job raising) still aborts the run, as before.
+    if failed:
+        raise failed[0]
+    return results
+
+async def serve(stream, rps=0):
+    """
+    Server mode: one JSON request {id, job_title, text} per stdin line, one
+    JSON response {id, job_title, min_years} or {id, error} per stdout line.
+    Requests are answered in order on a single event loop, so the OpenAI
+    client and its connection pool live as long as the process.
+    """
+    bucket = TokenBucket(rps) if rps > 0 else None
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            data = json_loads(line)
+        except ValueError:
+            print(json.dumps({"id": None, "error": "invalid_request"}), flush=True)
+            continue
+        if not isinstance(data, dict):
+            print(json.dumps({"id": None, "error": "invalid_request"}), flush=True)
+            continue
+
+        try:
+            title, text = read_job(data)
+            result = await extract_min_years(trim_text(text), scraped_title=title, bucket=bucket)
+            msg = {"id": data.get("id"), **format_output(result, title)}
+        except Exception as e:
+            msg = {"id": data.get("id"), "error": str(e)}
+        print(json.dumps(msg), flush=True)
+
+# --------- Batch API mode ---------
+
+def job_digest(title, trimmed):
+    h = hashlib.sha256()
+    h.update(title.encode("utf-8"))
+    h.update(b"\0")
+    h.update(trimmed.encode("utf-8"))
+    return h.hexdigest()
+
+def read_jobs_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json_loads(line)
+
+def submit_batch(requests):
+    """
+    Writes one Batch API request per line and submits the file.
+    Returns the created batch id.
+    """
+    fd, path = tempfile.mkstemp(prefix="extract_experience_batch_", suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            for custom_id, body in requests.items():
+                fh.write(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": body,
+                }))
+                fh.write("\n")
+        with open(path, "rb") as fh:
+            batch_file = client.files.create(file=fh, purpose="batch")
+    finally:
+        os.unlink(path)
+
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    return batch.id
+
+def load_batch_state(state_path, input_digest):
+    if not state_path or not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+    except Exception:
+        return None
+    # Only resume a batch that was submitted for the same input.
+    if state.get("input_digest") != input_digest:
+        return None
+    return state.get("batch_id")
+
+def save_batch_state(state_path, input_digest, batch_id):
+    if not state_path:
+        return
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({"input_digest": input_digest, "batch_id": batch_id}, fh)
+    os.replace(tmp_path, state_path)
+
+def wait_for_batch(batch_id, poll_seconds):
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in BATCH_TERMINAL_STATUSES:
+            return batch
+        print(f"batch_pending id={batch_id} status={batch.status}", file=sys.stderr)
+        time.sleep(poll_seconds)
+
+def run_batch(jobs, state_path=None, poll_seconds=30):
+    """
+    Extracts many jobs through one Batch API submission.
+
+    Jobs are keyed by a digest of title + trimmed text, so re-scraped
+    duplicates are sent once. The batch id is written to state_path right
+    after submission; re-running with the same input resumes polling instead
+    of submitting again (safe to Ctrl-C while waiting).
+
+    Returns one output dict per input job, in input order.
+    """
+    keyed = []
+    titles = {}
+    cache_keys = {}
+    requests = {}
+    results = {}
+    for data in jobs:
+        title, text = read_job(data)
+        trimmed = trim_text(text)
+        custom_id = job_digest(title, trimmed)
+        keyed.append((custom_id, title))
+        if custom_id not in requests and custom_id not in results:
+            if not needs_llm(trimmed):
+                results[custom_id] = {"job_title": title, "min_years": 0}
+                continue
+            titles[custom_id] = title
+            cache_keys[custom_id] = cache_key(trimmed, title)
+            cached = cache_get(cache_keys[custom_id])
+            if cached is not None:
+                results[custom_id] = cached
+                continue
+            requests[custom_id] = {
+                "model": MODEL,
+                "temperature": 0,
+                "response_format": {"type": "json_object"},
+                "messages": build_messages(trimmed, scraped_title=title),
+            }
+
+    if requests:
+        fetched = fetch_batch_results(requests, titles, state_path, poll_seconds)
+        for custom_id, result in fetched.items():
+            cache_put(cache_keys[custom_id], result)
+        results.update(fetched)
+
+    outputs = []
+    for custom_id, title in keyed:
+        result = results.get(custom_id)
+        if result is None:
+            # Request errored or expired inside the batch; keep the
+            # conservative default used for unparseable answers.
+            result = {"job_title": title, "min_years": 0}
+        outputs.append(format_output(result, title))
+    return outputs
+
+def fetch_batch_results(requests, titles, state_path, poll_seconds):
+    """
+    Submits (or resumes) the batch and returns {custom_id: parsed result}.
+    """
+    input_digest = hashlib.sha256("\n".join(sorted(requests)).encode("utf-8")).hexdigest()
+    batch_id = load_batch_state(state_path, input_digest)
+    if batch_id is None:
+        batch_id = submit_batch(requests)
+        save_batch_state(state_path, input_digest, batch_id)
+        print(f"batch_submitted id={batch_id} requests={len(requests)}", file=sys.stderr)
+
+    batch = wait_for_batch(batch_id, poll_seconds)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"batch_failed id={batch_id} status={batch.status}")
+
+    results = {}
+    output = client.files.content(batch.output_file_id).text
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        custom_id = item.get("custom_id")
+        title = titles.get(custom_id, "")
+        body = (item.get("response") or {}).get("body") or {}
+        try:
+            raw = body["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            continue
+        results[custom_id] = parse_model_output(raw, scraped_title=title)
+
+    if state_path and os.path.exists(state_path):
+        os.unlink(state_path)
+    return results
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--batch",
+        action="store_true",
+        help="Read JSONL jobs from stdin and extract them via the OpenAI Batch API",
+    )
+    ap.add_argument(
+        "--batch-state",
+        default=None,
+        help="File recording the submitted batch id so an interrupted run can resume",
+    )
+    ap.add_argument("--poll-seconds", type=int, default=30)
+    ap.add_argument(
+        "--server",
+        action="store_true",
+        help="Answer one JSON request per stdin line until EOF (used by inference_worker)",
+    )
+    ap.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Max concurrent API calls when several jobs are piped in",
+    )
+    ap.add_argument(
+        "--rps",
+        type=float,
+        default=float(os.getenv("OPENAI_MAX_RPS", "0")),
+        help="Max API requests started per second (0 = unlimited)",
+    )
+    args = ap.parse_args()
+
+    if args.batch:
+        outputs = run_batch(
+            read_jobs_jsonl(sys.stdin.buffer),
+            state_path=args.batch_state,
+            poll_seconds=args.poll_seconds,
+        )
+        for output in outputs:
+            print(json.dumps(output))
+        return
+
+    if args.server:
+        asyncio.run(serve(sys.stdin.buffer, rps=args.rps))
+        return
+
+    jobs = read_jobs(sys.stdin.buffer)
+    failed = 0
+    for output, error in asyncio.run(extract_jobs(jobs, concurrency=args.concurrency, rps=args.rps)):
+        if error is not None:
+            failed += 1
+            print(f"extract_failed job_title={output['job_title']!r} error={error}", file=sys.stderr)
+        print(json.dumps(output))
+
+    # Nonzero exit lets callers (inference_worker) retry failed jobs.
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
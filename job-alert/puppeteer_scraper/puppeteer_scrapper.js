@@ -135,62 +135,105 @@ async function scrapeJob(url) {
     ],
   });
 
-  const page = await browser.newPage();
-
-  // Speed optimizations
-  await page.setRequestInterception(true);
-  page.on("request", (req) => {
-    const type = req.resourceType();
-    if (["image", "stylesheet", "font", "media"].includes(type)) {
-      req.abort();
-    } else {
-      req.continue();
-    }
-  });
+  // Closed on every path: in --server mode a failed page must not leak Chrome.
+  try {
+    const page = await browser.newPage();
+
+    // Speed optimizations
+    await page.setRequestInterception(true);
+    page.on("request", (req) => {
+      const type = req.resourceType();
+      if (["image", "stylesheet", "font", "media"].includes(type)) {
+        req.abort();
+      } else {
+        req.continue();
+      }
+    });
 
-  await page.setUserAgent(
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) " +
-    "AppleWebKit/537.36 (KHTML, like Gecko) " +
-    "Chrome/121.0.0.0 Safari/537.36"
-  );
+    await page.setUserAgent(
+      "Mozilla/5.0 (Windows NT 10.0; Win64; x64) " +
+      "AppleWebKit/537.36 (KHTML, like Gecko) " +
+      "Chrome/121.0.0.0 Safari/537.36"
+    );
 
-  await page.goto(url, {
-    waitUntil: "networkidle2",
-    timeout: 60000,
-  });
+    await page.goto(url, {
+      waitUntil: "networkidle2",
+      timeout: 60000,
+    });
 
-  await acceptCookies(page);
-  await delay(2000);
+    await acceptCookies(page);
+    await delay(2000);
 
-  // ✅ Extract job title (DOM-first)
-  const jobTitle = await page.evaluate(() => {
-    const h1 = document.querySelector("h1");
-    if (h1 && h1.innerText.trim().length > 3) {
-      return h1.innerText.trim();
-    }
+    // ✅ Extract job title (DOM-first)
+    const jobTitle = await page.evaluate(() => {
+      const h1 = document.querySelector("h1");
+      if (h1 && h1.innerText.trim().length > 3) {
+        return h1.innerText.trim();
+      }
 
-    const h2 = document.querySelector("h2");
-    if (h2 && h2.innerText.trim().length > 3) {
-      return h2.innerText.trim();
-    }
+      const h2 = document.querySelector("h2");
+      if (h2 && h2.innerText.trim().length > 3) {
+        return h2.innerText.trim();
+      }
 
-    return document.title || "";
-  });
+      return document.title || "";
+    });
 
-  // ✅ Extract rendered text
-  const text = await page.evaluate(() => document.body.innerText || "");
+    // ✅ Extract rendered text
+    const text = await page.evaluate(() => document.body.innerText || "");
 
-  await browser.close();
+    return {
+      job_title: jobTitle,
+      text: text
+    };
+  } finally {
+    await browser.close();
+  }
+}
+
+// --------- server mode ---------
+
+// One JSON request {id, url} per stdin line, one JSON response
+// {id, job_title, text} or {id, error} per stdout line. Requests are handled
+// one at a time, in order, so a single long-lived process serves a worker.
+async function serve() {
+  const readline = require("node:readline");
+
+  // stdout carries the protocol; keep incidental logging on stderr.
+  console.log = (...args) => console.error(...args);
+
+  const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+
+  for await (const line of rl) {
+    if (!line.trim()) continue;
+
+    let req;
+    try {
+      req = JSON.parse(line);
+    } catch {
+      process.stdout.write(JSON.stringify({ id: null, error: "invalid_request" }) + "\n");
+      continue;
+    }
 
-  return {
-    job_title: jobTitle,
-    text: text
-  };
+    let msg;
+    try {
+      const result = await scrapeJob(req.url);
+      msg = { id: req.id, ...result };
+    } catch (err) {
+      msg = { id: req.id, error: String((err && err.stack) || err) };
+    }
+    process.stdout.write(JSON.stringify(msg) + "\n");
+  }
 }
 
 // --------- CLI runner ---------
 
 (async () => {
+  if (process.argv[2] === "--server") {
+    await serve();
+    return;
+  }
+
   const url = process.argv[2];
   if (!url) {
     console.error("❌ Please provide a job URL");
@@ -105,14 +105,22 @@ async function extractLinks(page) {
   });
 }
 
-export async function getAllLinks(url) {
+// signal (optional AbortSignal): aborting closes the browser, which makes
+// whatever step is in progress reject, so the page is freed right away.
+export async function getAllLinks(url, { signal } = {}) {
   if (!isHttpUrl(url)) {
     throw new Error(`Invalid URL protocol: ${url}`);
   }
 
+  signal?.throwIfAborted();
   const browser = await launchBrowser();
+  const closeOnAbort = () => {
+    browser.close().catch(() => {});
+  };
+  signal?.addEventListener("abort", closeOnAbort, { once: true });
 
   try {
+    signal?.throwIfAborted();
     const page = await createPage(browser);
 
     const nav = await renderPage(page, url);
@@ -129,6 +137,9 @@ export async function getAllLinks(url) {
 
     return links;
   } finally {
-    await browser.close();
+    signal?.removeEventListener("abort", closeOnAbort);
+    if (browser.connected) {
+      await browser.close();
+    }
   }
 }
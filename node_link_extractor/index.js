@@ -1,17 +1,136 @@
+import readline from "node:readline";
 import { getAllLinks } from "./getAllLinks.js";
 
-const url = process.argv[2];
-if (!url) {
-  console.error("Usage: node index.js <url>");
-  process.exit(1);
+function isHttpUrl(value) {
+  return typeof value === "string" && /^https?:\/\//i.test(value.trim());
 }
-if (!/^https?:\/\//i.test(url.trim())) {
-  console.error("URL must start with http:// or https://");
-  process.exit(1);
+
+function positiveInt(value, fallback) {
+  const n = Number.parseInt(value, 10);
+  return Number.isFinite(n) && n > 0 ? n : fallback;
+}
+
+// Each request launches its own browser, so cap how many run at once.
+const MAX_CONCURRENCY = positiveInt(process.env.LINK_SERVER_MAX_CONCURRENCY, 4);
+// Used when a request carries no timeout_ms of its own.
+const DEFAULT_TIMEOUT_MS = positiveInt(process.env.LINK_SERVER_TIMEOUT_MS, 180000);
+
+function writeResponse(msg) {
+  process.stdout.write(JSON.stringify(msg) + "\n");
+}
+
+async function handleRequest({ id, url }, signal) {
+  const t0 = Date.now();
+  try {
+    if (!isHttpUrl(url)) {
+      throw new Error("URL must start with http:// or https://");
+    }
+    const links = await getAllLinks(url, { signal });
+    writeResponse({ id, links, node_ms: Date.now() - t0 });
+  } catch (err) {
+    // An abort surfaces as whatever puppeteer threw once the browser closed; report why instead.
+    const error = signal.aborted ? String(signal.reason) : String((err && err.stack) || err);
+    writeResponse({ id, error, node_ms: Date.now() - t0 });
+  }
+}
+
+// Server mode: one JSON request {id, url, timeout_ms?} per stdin line, one
+// JSON response {id, links, node_ms} or {id, error, node_ms} per stdout line.
+// At most MAX_CONCURRENCY requests run at once; the rest wait in order.
+// Responses may come back out of order; callers match by id.
+// {id, cancel: true} aborts that request (queued or running) and closes its
+// browser; a request also aborts itself once timeout_ms has passed.
+async function serve() {
+  // stdout carries the protocol; keep incidental logging on stderr.
+  console.log = (...args) => console.error(...args);
+
+  const jobs = new Map();
+  const queue = [];
+  const inFlight = new Set();
+
+  function pump() {
+    while (inFlight.size < MAX_CONCURRENCY && queue.length > 0) {
+      const job = queue.shift();
+      if (job.controller.signal.aborted) continue;
+      job.started = true;
+      const p = handleRequest(job.req, job.controller.signal).finally(() => {
+        clearTimeout(job.timer);
+        jobs.delete(job.req.id);
+        inFlight.delete(p);
+        pump();
+      });
+      inFlight.add(p);
+    }
+  }
+
+  function enqueue(req) {
+    const t0 = Date.now();
+    const timeoutMs = positiveInt(req.timeout_ms, DEFAULT_TIMEOUT_MS);
+    const job = { req, controller: new AbortController(), started: false, timer: null };
+    const { signal } = job.controller;
+
+    job.timer = setTimeout(() => job.controller.abort(new Error(`timeout after ${timeoutMs}ms`)), timeoutMs);
+    signal.addEventListener(
+      "abort",
+      () => {
+        // A running request answers from handleRequest; a queued one never will.
+        if (job.started) return;
+        clearTimeout(job.timer);
+        jobs.delete(req.id);
+        writeResponse({ id: req.id, error: String(signal.reason), node_ms: Date.now() - t0 });
+      },
+      { once: true }
+    );
+
+    jobs.set(req.id, job);
+    queue.push(job);
+    pump();
+  }
+
+  const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+
+  for await (const line of rl) {
+    if (!line.trim()) continue;
+
+    let req;
+    try {
+      req = JSON.parse(line);
+    } catch {
+      writeResponse({ id: null, error: "invalid_request" });
+      continue;
+    }
+
+    if (req.cancel) {
+      const job = jobs.get(req.id);
+      if (job) job.controller.abort(new Error("cancelled"));
+      continue;
+    }
+
+    enqueue(req);
+  }
+
+  // Each finishing request starts the next queued one before it settles.
+  while (inFlight.size > 0) {
+    await Promise.allSettled(inFlight);
+  }
 }
 
-const links = await getAllLinks(url);
+if (process.argv[2] === "--server") {
+  await serve();
+} else {
+  const url = process.argv[2];
+  if (!url) {
+    console.error("Usage: node index.js <url> | node index.js --server");
+    process.exit(1);
+  }
+  if (!isHttpUrl(url)) {
+    console.error("URL must start with http:// or https://");
+    process.exit(1);
+  }
+
+  const links = await getAllLinks(url);
 
-for (const link of links) {
-  console.log(link);
+  for (const link of links) {
+    console.log(link);
+  }
 }
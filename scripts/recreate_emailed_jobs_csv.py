@@ -9,6 +9,7 @@ emailed_at,site,url,job_title,min_years,created_ts_ms,digest_id
 - If the file doesn't exist, exits with status 1.
 - If the timestamp is numeric (epoch ms), converts to ISO8601 UTC.
 - If already ISO, keeps it.
+- If already split into emailed_date/emailed_time, keeps both as they are.
 
 Usage:
   ./scripts/recreate_emailed_jobs_csv.py [--csv PATH]
@@ -21,29 +22,54 @@ import csv
 import datetime
 import os
 import sys
-from typing import List, Dict
+from typing import Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+    MT_TZ = ZoneInfo("America/Denver")
+except Exception:
+    # No tz database available: keep times in UTC.
+    MT_TZ = None
 
 
 def parse_timestamp(val: str) -> str:
-    val = (val or "").strip()
-    if not val:
+    s = (val or "").strip()
+    if not s:
         return ""
-    # numeric epoch milliseconds
-    try:
-        if val.isdigit():
-            ms = int(val)
-            dt = datetime.datetime.utcfromtimestamp(ms / 1000.0)
-            return dt.replace(microsecond=0).isoformat() + "Z"
-    except Exception:
-        pass
-    # try parse common ISO formats
-    try:
-        # let datetime parse as much as possible
-        parsed = datetime.datetime.fromisoformat(val.replace("Z", "+00:00"))
+    # Pick exactly one path per value up front instead of trying parsers and
+    # catching their exceptions; only malformed values reach an except.
+    if s.isdecimal():
+        # numeric epoch milliseconds
+        try:
+            dt = datetime.datetime.utcfromtimestamp(int(s) / 1000.0)
+        except (OverflowError, OSError, ValueError):
+            return s
+        return dt.replace(microsecond=0).isoformat() + "Z"
+    if len(s) >= 10 and s[:4].isdigit() and s[4] == "-":
+        # ISO date or datetime
+        try:
+            parsed = datetime.datetime.fromisoformat(s.replace("Z", "+00:00"))
+        except ValueError:
+            return s
         return parsed.astimezone(datetime.timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    # unknown format: keep original
+    return s
+
+
+CANONICAL_HEADER = ["emailed_date", "emailed_time", "site", "url", "job_title", "min_years"]
+
+
+def to_mountain_date_time(ts_norm: str) -> Tuple[str, str]:
+    # ts_norm expected to be ISO datetime or empty
+    if not ts_norm:
+        return "", ""
+    try:
+        parsed = datetime.datetime.fromisoformat(ts_norm.replace("Z", "+00:00"))
+        # convert to Mountain Time
+        mt = parsed.astimezone(MT_TZ) if MT_TZ is not None else parsed
+        return mt.strftime("%Y-%m-%d"), mt.strftime("%I:%M:%S %p").lstrip("0")
     except Exception:
-        # fallback: keep original
-        return val
+        return "", ""
 
 
 def main() -> int:
@@ -57,10 +83,9 @@ def main() -> int:
         return 1
 
     tmp_path = csv_path + ".tmp"
-    rows: List[Dict[str, str]] = []
 
-    with open(csv_path, newline="", encoding="utf-8") as fh:
-        reader = csv.reader(fh)
+    with open(csv_path, newline="", encoding="utf-8") as src:
+        reader = csv.reader(src)
         header = next(reader, None)
         if header is None:
             print("Empty CSV, nothing to do", file=sys.stderr)
@@ -68,85 +93,43 @@ def main() -> int:
         # Normalize header names to lower-case
         header_lc = [h.strip().lower() for h in header]
 
-        # Determine timestamp column index (prefer emailed_at, emailed_ts_ms, emailed_at, or first col)
+        # Determine timestamp column index once (prefer emailed_at, emailed_ts_ms,
+        # split emailed_date/emailed_time, or first col)
+        split_mode = False
+        date_idx = time_idx = -1
+        ts_idx = 0
         if "emailed_at" in header_lc:
             ts_idx = header_lc.index("emailed_at")
         elif "emailed_ts_ms" in header_lc:
             ts_idx = header_lc.index("emailed_ts_ms")
         elif "emailed_date" in header_lc and "emailed_time" in header_lc:
             # already split; we'll combine
+            split_mode = True
             date_idx = header_lc.index("emailed_date")
             time_idx = header_lc.index("emailed_time")
-            ts_idx = None
-        else:
-            ts_idx = 0
-
-        for r in reader:
-            # pad row if short
-            while len(r) < len(header_lc):
-                r.append("")
-            if 'date_idx' in locals() and 'time_idx' in locals():
-                date_raw = r[date_idx]
-                time_raw = r[time_idx]
-                # try to parse combined
-                ts_dt = None
-                if date_raw:
-                    try:
-                        ts_str = f"{date_raw} {time_raw}"
-                        ts_dt = datetime.datetime.fromisoformat(date_raw)
-                    except Exception:
-                        ts_dt = None
-                # fallback to numeric parse if needed
-                if ts_dt is None and ts_idx is not None:
-                    ts_raw = r[ts_idx]
-                    ts_norm = parse_timestamp(ts_raw)
-                    r_ts = ts_norm
-                else:
-                    r_ts = f"{date_raw} {time_raw}".strip()
-                r[0:len(r)] = r  # keep row
-                rows.append((r, r_ts))
-            else:
-                ts_raw = r[ts_idx] if ts_idx is not None else ""
-                ts_norm = parse_timestamp(ts_raw)
-                rows.append((r, ts_norm))
-
-        # write normalized CSV with canonical header
-        canonical_header = ["emailed_date", "emailed_time", "site", "url", "job_title", "min_years"]
-
-        with open(tmp_path, "w", newline="", encoding="utf-8") as fh:
-            writer = csv.writer(fh)
-            writer.writerow(canonical_header)
-            for r, ts_norm in rows:
-                # ts_norm expected to be ISO datetime or empty
-                if ts_norm:
-                    try:
-                        parsed = datetime.datetime.fromisoformat(ts_norm.replace("Z", "+00:00"))
-                        # convert to Mountain Time
-                        try:
-                            from zoneinfo import ZoneInfo
-                            mt = parsed.astimezone(ZoneInfo("America/Denver"))
-                        except Exception:
-                            mt = parsed
-                        emailed_date = mt.strftime("%Y-%m-%d")
-                        emailed_time = mt.strftime("%I:%M:%S %p").lstrip("0")
-                    except Exception:
-                        emailed_date = ""
-                        emailed_time = ""
+
+        # Output column positions, resolved once; -1 means the column is missing.
+        out_idx = [header_lc.index(h) if h in header_lc else -1 for h in ("site", "url", "job_title", "min_years")]
+
+        # Single pass: each row is normalized and written as soon as it is read,
+        # so memory stays constant regardless of file size.
+        with open(tmp_path, "w", newline="", encoding="utf-8", buffering=1 << 20) as dst:
+            writer = csv.writer(dst)
+            writer.writerow(CANONICAL_HEADER)
+            for r in reader:
+                # pad row if short
+                while len(r) < len(header_lc):
+                    r.append("")
+
+                if split_mode:
+                    # Already Mountain date + time (this script's own output); keep as is.
+                    emailed_date, emailed_time = r[date_idx], r[time_idx]
                 else:
-                    emailed_date = ""
-                    emailed_time = ""
-
-                # build mapping from header to value
-                row_map = {h: r[i] if i < len(r) else "" for i, h in enumerate(header_lc)}
-                out_row = [
-                    emailed_date,
-                    emailed_time,
-                    row_map.get("site", ""),
-                    row_map.get("url", ""),
-                    row_map.get("job_title", ""),
-                    row_map.get("min_years", ""),
-                ]
-                writer.writerow(out_row)
+                    emailed_date, emailed_time = to_mountain_date_time(parse_timestamp(r[ts_idx]))
+
+                out = [emailed_date, emailed_time]
+                out.extend(r[i] if i >= 0 else "" for i in out_idx)
+                writer.writerow(out)
 
     os.replace(tmp_path, csv_path)
     print(f"Recreated CSV: {csv_path}")
@@ -23,6 +23,8 @@ if ! ( set -o noclobber; echo "$$" > "$LOCK_FILE" ) 2>/dev/null; then
   echo "$$" > "$LOCK_FILE"
 fi
 
+MAX_WORKERS="${INFERENCE_MAX_WORKERS:-1}"
+
 # Start worker in background so we can forward signals and wait on it
 python -m tracker.inference_worker \
   --db ./state/snapshots.sqlite3 \
@@ -32,6 +34,7 @@ python -m tracker.inference_worker \
   --extract-experience-py ./job-alert/extract_experience.py \
   --timeout-seconds 120 \
   --poll-sleep-seconds 2 \
+  --max-workers "$MAX_WORKERS" \
   --verbose &
 CHILD_PID=$!
 
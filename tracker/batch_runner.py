@@ -20,16 +20,25 @@ import logging
 import os
 import sys
 import time
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, replace
+from typing import List, Optional, Tuple
 
 from tracker.config_loader import CompanyTarget, load_company_targets_csv
 from tracker.db import SQLiteState, SnapshotRow, now_epoch_ms
-from tracker.diffing import build_diff_payload, diff_links
-from tracker.run_common import fetch_links_or_raise, setup_logging, snapshot_hash_for_links, json_sample
+from tracker.diffing import build_diff_payload
+from tracker.run_common import (
+    CompanyWrite,
+    WriteBatch,
+    compute_link_delta,
+    fetch_links_or_raise,
+    json_sample,
+    setup_logging,
+)
 
 LOG = logging.getLogger("tracker.batch_runner")
 
+DEFAULT_COMMIT_EVERY = 16
+
 
 @dataclass(frozen=True)
 class CompanyRunResult:
@@ -48,16 +57,20 @@ class CompanyRunResult:
 def run_company_once(
     *,
     state: SQLiteState,
+    result_index: int,
     company: str,
     url: str,
     node_workdir: str,
     node_bin: str,
     node_timeout_seconds: int,
-) -> CompanyRunResult:
+) -> Tuple[CompanyRunResult, CompanyWrite]:
+    """
+    Fetches and diffs one company. Writes nothing: the returned CompanyWrite
+    goes to the caller's WriteBatch.
+    """
     t0 = time.perf_counter()
 
-    old_links = state.get_current_links(company) or []
-    LOG.info("company_start company=%s url=%s old_link_count=%d", company, url, len(old_links))
+    LOG.info("company_start company=%s url=%s", company, url)
 
     node = fetch_links_or_raise(
         url=url,
@@ -68,34 +81,32 @@ def run_company_once(
     )
 
     new_links = node.links
-    added_links, removed_links = diff_links(old_links, new_links)
+    delta = compute_link_delta(state=state, site=company, new_links=new_links)
+    added_links, removed_links = delta.added, delta.removed
 
     diff_payload = build_diff_payload(company, added_links)
+    diff_enqueued = bool(diff_payload.added_urls)
 
-    diff_enqueued = False
-    if diff_payload.added_urls:
-        diff_enqueued = state.enqueue_diff(
+    write = CompanyWrite(
+        result_index=result_index,
+        snapshot=SnapshotRow(
             site=company,
-            diff_hash=diff_payload.diff_hash,
-            added_urls=diff_payload.added_urls,
-        )
-
-    snapshot = SnapshotRow(
-        site=company,
-        url=url,
-        ts_ms=now_epoch_ms(),
-        snapshot_hash=snapshot_hash_for_links(new_links),
-        links=new_links,
+            url=url,
+            ts_ms=now_epoch_ms(),
+            snapshot_hash=delta.snapshot_hash,
+            links=new_links,
+        ),
+        diff=diff_payload if diff_enqueued else None,
     )
-    state.upsert_snapshot(snapshot)
 
     total_ms = int((time.perf_counter() - t0) * 1000)
 
     LOG.info(
-        "company_done company=%s ok=true total_ms=%d node_ms=%d new_link_count=%d added=%d removed=%d diff_enqueued=%s",
+        "company_done company=%s ok=true total_ms=%d node_ms=%d old_link_count=%d new_link_count=%d added=%d removed=%d diff_enqueued=%s",
         company,
         total_ms,
         node.node_ms,
+        delta.old_link_count,
         len(new_links),
         len(added_links),
         len(removed_links),
@@ -105,18 +116,19 @@ def run_company_once(
     if LOG.isEnabledFor(logging.DEBUG) and added_links:
         LOG.debug("company_added_sample company=%s sample=%s", company, json_sample(added_links, 10))
 
-    return CompanyRunResult(
+    result = CompanyRunResult(
         company=company,
         url=url,
         ok=True,
         error=None,
-        old_link_count=len(old_links),
+        old_link_count=delta.old_link_count,
         new_link_count=len(new_links),
         added_url_count=len(diff_payload.added_urls),
         diff_enqueued=diff_enqueued,
         node_ms=node.node_ms,
         total_ms=total_ms,
     )
+    return result, write
 
 
 def run_batch(
@@ -127,21 +139,23 @@ def run_batch(
     node_bin: str,
     node_timeout_seconds: int,
     stop_on_error: bool,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
 ) -> dict:
     started_ms = now_epoch_ms()
     t0 = time.perf_counter()
 
     LOG.info(
-        "batch_start csv_path=%s db_path=%s node_workdir=%s node_bin=%s node_timeout_seconds=%d stop_on_error=%s",
+        "batch_start csv_path=%s db_path=%s node_workdir=%s node_bin=%s node_timeout_seconds=%d stop_on_error=%s commit_every=%d",
         csv_path,
         db_path,
         node_workdir,
         node_bin,
         node_timeout_seconds,
         str(stop_on_error).lower(),
+        commit_every,
     )
 
-    targets: List[CompanyTarget] = load_company_targets_csv(csv_path)
+    targets: Tuple[CompanyTarget, ...] = load_company_targets_csv(csv_path)
     LOG.info("targets_loaded count=%d", len(targets))
 
     state = SQLiteState(db_path)
@@ -150,12 +164,24 @@ def run_batch(
     ok_count = 0
     fail_count = 0
 
+    # Rows are written commit_every companies at a time, in one short
+    # transaction after the fetches, never while node is running.
+    writes = WriteBatch(state, commit_every, log=LOG)
+
+    def flush_writes() -> None:
+        nonlocal ok_count, fail_count
+        for i in writes.flush():
+            results[i] = replace(results[i], ok=False, error="snapshot_write_failed", diff_enqueued=False)
+            ok_count -= 1
+            fail_count += 1
+
     try:
         for idx, t in enumerate(targets, start=1):
             LOG.info("progress %d/%d company=%s", idx, len(targets), t.company)
             try:
-                r = run_company_once(
+                r, write = run_company_once(
                     state=state,
+                    result_index=len(results),
                     company=t.company,
                     url=t.url,
                     node_workdir=node_workdir,
@@ -164,6 +190,8 @@ def run_batch(
                 )
                 results.append(r)
                 ok_count += 1
+                if writes.add(write):
+                    flush_writes()
             except Exception:
                 fail_count += 1
                 LOG.exception("company_failed company=%s url=%s", t.company, t.url)
@@ -187,6 +215,7 @@ def run_batch(
                     LOG.error("stop_on_error=true stopping_batch")
                     break
     finally:
+        flush_writes()
         state.close()
         LOG.debug("db_closed path=%s", db_path)
 
@@ -223,6 +252,12 @@ def main() -> None:
     ap.add_argument("--node-bin", default="node")
     ap.add_argument("--node-timeout-seconds", type=int, default=180)
     ap.add_argument("--stop-on-error", action="store_true")
+    ap.add_argument(
+        "--commit-every",
+        type=int,
+        default=DEFAULT_COMMIT_EVERY,
+        help="Companies written per SQLite transaction",
+    )
     ap.add_argument(
         "-v",
         "--verbose",
@@ -243,6 +278,7 @@ def main() -> None:
         node_bin=args.node_bin,
         node_timeout_seconds=args.node_timeout_seconds,
         stop_on_error=args.stop_on_error,
+        commit_every=max(1, args.commit_every),
     )
     print(json.dumps(report, indent=2, sort_keys=True))
 
@@ -8,16 +8,27 @@ import os
 import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import List, Optional, Tuple
 
 from tracker.config_loader import CompanyTarget, load_company_targets_csv
-from tracker.db import SQLiteState, SnapshotRow, now_epoch_ms
-from tracker.diffing import build_diff_payload, diff_links
-from tracker.run_common import fetch_links_or_raise, json_sample, setup_logging, snapshot_hash_for_links
+from tracker.db import SQLiteState, SnapshotRow, ThreadLocalStates, now_epoch_ms
+from tracker.diffing import DiffPayload, build_diff_payload
+from tracker.run_common import (
+    CompanyWrite,
+    LinkDelta,
+    NodeWorker,
+    WriteBatch,
+    compute_link_delta,
+    fetch_links_or_raise,
+    json_sample,
+    setup_logging,
+)
 
 LOG = logging.getLogger("tracker.batch_runner")
 
+DEFAULT_COMMIT_EVERY = 16
+
 
 @dataclass(frozen=True)
 class CompanyRunResult:
@@ -33,77 +44,52 @@ class CompanyRunResult:
 
 def _compute_delta_no_writes(
     *,
-    db_path: str,
-    db_lock: threading.Lock,
+    state: SQLiteState,
     company: str,
     url: str,
     node_workdir: str,
     node_bin: str,
     node_timeout_seconds: int,
-) -> Tuple[List[str], List[str], List[str], int, int]:
+    node_worker: Optional[NodeWorker],
+) -> Tuple[List[str], LinkDelta, int]:
     """
     Returns:
-    new_links, added_links, removed_links, old_count, node_ms
+    new_links, delta, node_ms
     """
-    # Read snapshot with a connection created in THIS worker thread.
-    # Lock is optional for reads, but it avoids read versus write contention.
-    with db_lock:
-        state = SQLiteState(db_path)
-        try:
-            old_links = state.get_current_links(company) or []
-        finally:
-            state.close()
-
-    old_count = len(old_links)
-
     node = fetch_links_or_raise(
         url=url,
         node_bin=node_bin,
         node_workdir=node_workdir,
         timeout_seconds=node_timeout_seconds,
         log=LOG,
+        node_worker=node_worker,
     )
     new_links = node.links
 
-    added_links, removed_links = diff_links(old_links, new_links)
-    return new_links, added_links, removed_links, old_count, node.node_ms
+    # No lock needed: WAL readers never block on the writer.
+    delta = compute_link_delta(state=state, site=company, new_links=new_links)
+    return new_links, delta, node.node_ms
 
 
-def _commit_writes(
+def _build_writes(
     *,
-    db_path: str,
     company: str,
     url: str,
     new_links: List[str],
-    added_links: List[str],
-) -> Tuple[bool, int]:
+    delta: LinkDelta,
+) -> Tuple[SnapshotRow, Optional[DiffPayload]]:
     """
-    Returns diff_enqueued, added_url_count
+    Returns snapshot, diff (None when nothing was added); written later by the batch.
     """
-    state = SQLiteState(db_path)
-    try:
-        diff_payload = build_diff_payload(company, added_links)
-
-        diff_enqueued = False
-        if diff_payload.added_urls:
-            diff_enqueued = state.enqueue_diff(
-                site=company,
-                diff_hash=diff_payload.diff_hash,
-                added_urls=diff_payload.added_urls,
-            )
-
-        snapshot = SnapshotRow(
-            site=company,
-            url=url,
-            ts_ms=now_epoch_ms(),
-            snapshot_hash=snapshot_hash_for_links(new_links),
-            links=new_links,
-        )
-        state.upsert_snapshot(snapshot)
-
-        return diff_enqueued, len(diff_payload.added_urls)
-    finally:
-        state.close()
+    diff_payload = build_diff_payload(company, delta.added)
+    snapshot = SnapshotRow(
+        site=company,
+        url=url,
+        ts_ms=now_epoch_ms(),
+        snapshot_hash=delta.snapshot_hash,
+        links=new_links,
+    )
+    return snapshot, (diff_payload if diff_payload.added_urls else None)
 
 
 def run_batch(
@@ -115,12 +101,14 @@ def run_batch(
     node_timeout_seconds: int,
     stop_on_error: bool,
     max_workers: int,
+    node_per_company: bool = False,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
 ) -> dict:
     started_ms = now_epoch_ms()
     batch_t0 = time.perf_counter()
 
     LOG.info(
-        "batch_start csv_path=%s db_path=%s node_workdir=%s node_bin=%s node_timeout_seconds=%d stop_on_error=%s max_workers=%d",
+        "batch_start csv_path=%s db_path=%s node_workdir=%s node_bin=%s node_timeout_seconds=%d stop_on_error=%s max_workers=%d node_per_company=%s commit_every=%d",
         csv_path,
         db_path,
         node_workdir,
@@ -128,42 +116,59 @@ def run_batch(
         node_timeout_seconds,
         str(stop_on_error).lower(),
         max_workers,
+        str(node_per_company).lower(),
+        commit_every,
     )
 
-    targets: List[CompanyTarget] = load_company_targets_csv(csv_path)
+    targets: Tuple[CompanyTarget, ...] = load_company_targets_csv(csv_path)
     LOG.info("targets_loaded count=%d", len(targets))
 
-    # Serialize DB writes (and optionally reads) across threads.
-    db_lock = threading.Lock()
+    # Reads go through per-thread connections. Worker threads never write:
+    # they hand their rows back to this thread, which writes commit_every
+    # companies per short transaction, so no write lock is held during a fetch.
+    states = ThreadLocalStates(db_path)
+    writer = SQLiteState(db_path)
+    writes = WriteBatch(writer, commit_every, log=LOG)
+
+    # One persistent node process serves every worker thread, so node/V8
+    # startup is paid once per batch instead of once per company.
+    node_worker = None if node_per_company else NodeWorker(node_bin=node_bin, node_workdir=node_workdir, log=LOG)
 
     results: List[CompanyRunResult] = []
     ok_count = 0
     fail_count = 0
 
-    def worker(t: CompanyTarget) -> CompanyRunResult:
+    # Set on stop_on_error: a company that has not started yet is skipped.
+    stop = threading.Event()
+
+    WorkerOutput = Tuple[CompanyRunResult, Optional[SnapshotRow], Optional[DiffPayload]]
+
+    def worker(t: CompanyTarget) -> Optional[WorkerOutput]:
+        if stop.is_set():
+            return None
         t0 = time.perf_counter()
         LOG.info("company_start company=%s url=%s", t.company, t.url)
 
         try:
-            new_links, added_links, removed_links, old_count, node_ms = _compute_delta_no_writes(
-                db_path=db_path,
-                db_lock=db_lock,
+            state = states.get()
+            new_links, delta, node_ms = _compute_delta_no_writes(
+                state=state,
                 company=t.company,
                 url=t.url,
                 node_workdir=node_workdir,
                 node_bin=node_bin,
                 node_timeout_seconds=node_timeout_seconds,
+                node_worker=node_worker,
             )
 
-            # Commit under lock so enqueue_diff + upsert_snapshot is atomic with respect to other threads.
-            with db_lock:
-                diff_enqueued, added_url_count = _commit_writes(
-                    db_path=db_path,
-                    company=t.company,
-                    url=t.url,
-                    new_links=new_links,
-                    added_links=added_links,
-                )
+            snapshot, diff = _build_writes(
+                company=t.company,
+                url=t.url,
+                new_links=new_links,
+                delta=delta,
+            )
+            diff_enqueued = diff is not None
+            added_url_count = len(diff.added_urls) if diff is not None else 0
 
             total_ms = int((time.perf_counter() - t0) * 1000)
 
@@ -172,33 +177,34 @@ def run_batch(
                 t.company,
                 total_ms,
                 node_ms,
-                old_count,
+                delta.old_link_count,
                 len(new_links),
                 added_url_count,
-                len(removed_links),
+                len(delta.removed),
                 str(diff_enqueued).lower(),
             )
 
-            if LOG.isEnabledFor(logging.DEBUG) and added_links:
+            if LOG.isEnabledFor(logging.DEBUG) and delta.added:
                 LOG.debug(
                     "company_added_sample company=%s sample=%s",
                     t.company,
-                    json_sample(added_links, 10),
+                    json_sample(delta.added, 10),
                 )
 
-            return CompanyRunResult(
+            r = CompanyRunResult(
                 company=t.company,
                 url=t.url,
                 ok=True,
                 error=None,
-                old_link_count=old_count,
+                old_link_count=delta.old_link_count,
                 new_link_count=len(new_links),
                 added_url_count=added_url_count,
                 diff_enqueued=diff_enqueued,
             )
+            return r, snapshot, diff
         except Exception as e:
             LOG.exception("company_failed company=%s url=%s", t.company, t.url)
-            return CompanyRunResult(
+            r = CompanyRunResult(
                 company=t.company,
                 url=t.url,
                 ok=False,
@@ -208,23 +214,48 @@ def run_batch(
                 added_url_count=0,
                 diff_enqueued=False,
             )
+            return r, None, None
 
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = [ex.submit(worker, t) for t in targets]
-
-        for fut in as_completed(futures):
-            r = fut.result()
-            results.append(r)
+    def flush_writes() -> None:
+        nonlocal ok_count, fail_count
+        for i in writes.flush():
+            results[i] = replace(results[i], ok=False, error="snapshot_write_failed", diff_enqueued=False)
+            ok_count -= 1
+            fail_count += 1
 
-            if r.ok:
-                ok_count += 1
-            else:
-                fail_count += 1
-                if stop_on_error:
-                    LOG.error("stop_on_error=true cancelling_pending")
-                    for f in futures:
-                        f.cancel()
-                    break
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            futures = [ex.submit(worker, t) for t in targets]
+
+            for fut in as_completed(futures):
+                # Cancelled by stop_on_error below.
+                if fut.cancelled():
+                    continue
+                out = fut.result()
+                if out is None:
+                    continue
+                r, snapshot, diff = out
+                results.append(r)
+
+                if r.ok:
+                    ok_count += 1
+                    if writes.add(CompanyWrite(result_index=len(results) - 1, snapshot=snapshot, diff=diff)):
+                        flush_writes()
+                else:
+                    fail_count += 1
+                    if stop_on_error and not stop.is_set():
+                        LOG.error("stop_on_error=true cancelling_pending")
+                        # Drop queued companies now; the ones already running
+                        # still finish here so their rows get written.
+                        stop.set()
+                        ex.shutdown(wait=False, cancel_futures=True)
+    finally:
+        if node_worker is not None:
+            node_worker.close()
+        flush_writes()
+        writer.close()
+        states.close_all()
+        LOG.debug("db_closed path=%s", db_path)
 
     ended_ms = now_epoch_ms()
     duration_ms = ended_ms - started_ms
@@ -266,7 +297,17 @@ def main() -> None:
         default=4,
         help="Thread pool size",
     )
-
+    ap.add_argument(
+        "--node-per-company",
+        action="store_true",
+        help="Spawn a fresh node process per company instead of one persistent node server",
+    )
+    ap.add_argument(
+        "--commit-every",
+        type=int,
+        default=DEFAULT_COMMIT_EVERY,
+        help="Companies written per SQLite transaction",
+    )
     ap.add_argument(
         "-v",
         "--verbose",
@@ -288,6 +329,8 @@ def main() -> None:
         node_timeout_seconds=args.node_timeout_seconds,
         stop_on_error=args.stop_on_error,
         max_workers=args.max_workers,
+        node_per_company=args.node_per_company,
+        commit_every=max(1, args.commit_every),
     )
     print(json.dumps(report, indent=2, sort_keys=True))
 
@@ -10,9 +10,8 @@ def main() -> None:
     ap.add_argument("--db", default="./state/snapshots.sqlite3")
     args = ap.parse_args()
 
-    state = SQLiteState(args.db)
-    n = state.clear_diff_queue()
-    state.close()
+    with SQLiteState(args.db) as state:
+        n = state.clear_diff_queue()
 
     print(f"cleared_diff_queue rows_deleted={n}")
 
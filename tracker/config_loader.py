@@ -2,17 +2,19 @@
 from __future__ import annotations
 
 import csv
+import functools
+import os
 from dataclasses import dataclass
-from typing import List
+from typing import List, Tuple
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CompanyTarget:
     company: str
     url: str
 
 
-def load_company_targets_csv(csv_path: str) -> List[CompanyTarget]:
+def load_company_targets_csv(csv_path: str) -> Tuple[CompanyTarget, ...]:
     """
     CSV format
     - 2 columns
@@ -22,31 +24,47 @@ def load_company_targets_csv(csv_path: str) -> List[CompanyTarget]:
     Supports both of these forms
     - With header: company,url
     - Without header: NVIDIA,https://...
+
+    Parsed targets are memoized per (path, mtime, size), so callers that
+    reload an unchanged file in the same process skip the parse.
     """
+    st = os.stat(csv_path)
+    return _load_company_targets_csv(os.path.abspath(csv_path), st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_company_targets_csv(csv_path: str, mtime_ns: int, size: int) -> Tuple[CompanyTarget, ...]:
+    # mtime_ns and size are only part of the cache key.
     targets: List[CompanyTarget] = []
+    first_row_seen = False
 
+    # Single pass: header detection, validation and object construction happen
+    # as rows stream out of csv.reader, without materializing the file.
     with open(csv_path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.reader(f)
-        rows = [row for row in reader if row and any(cell.strip() for cell in row)]
+        for row in csv.reader(f):
+            if not row or not any(cell.strip() for cell in row):
+                continue
 
-    if not rows:
-        return targets
+            if not first_row_seen:
+                first_row_seen = True
+                if _is_header_row(row):
+                    continue
 
-    first = [c.strip().lower() for c in rows[0]]
-    has_header = len(first) >= 2 and (
-        (first[0] in ("company", "company_name", "name") and first[1] in ("url", "link"))
-        or ("company" in first[0] and "url" in first[1])
-    )
+            if len(row) < 2:
+                continue
+            company = row[0].strip()
+            url = row[1].strip()
+            if not company or not url:
+                continue
+            targets.append(CompanyTarget(company=company, url=url))
 
-    data_rows = rows[1:] if has_header else rows
+    # Immutable, since the same tuple is handed to every caller that hits the cache.
+    return tuple(targets)
 
-    for row in data_rows:
-        if len(row) < 2:
-            continue
-        company = row[0].strip()
-        url = row[1].strip()
-        if not company or not url:
-            continue
-        targets.append(CompanyTarget(company=company, url=url))
 
-    return targets
+def _is_header_row(row: List[str]) -> bool:
+    first = [c.strip().lower() for c in row]
+    return len(first) >= 2 and (
+        (first[0] in ("company", "company_name", "name") and first[1] in ("url", "link"))
+        or ("company" in first[0] and "url" in first[1])
+    )
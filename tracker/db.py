@@ -1,20 +1,131 @@
 # tracker/db.py
 from __future__ import annotations
 
-import json
 import os
 import sqlite3
+import threading
 import time
+import zlib
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from tracker.diffing import DiffPayload
+from tracker.jsonutil import json_dumps, json_loads
+
+
+# UPDATE ... RETURNING fuses claim SELECT + UPDATE into one statement.
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Shared by upsert_snapshot and upsert_snapshots. links_json is kept NOT NULL
+# for older schemas; links_blob holds the data.
+_INSERT_SNAPSHOT_SQL = """
+INSERT INTO snapshots(site, url, ts_ms, snapshot_hash, links_json, links_blob, links_count)
+VALUES(?, ?, ?, ?, '', ?, ?);
+"""
+_UPSERT_CURRENT_SNAPSHOT_SQL = """
+INSERT INTO current_snapshot(site, url, ts_ms, snapshot_hash, links_json, links_blob, links_count)
+VALUES(?, ?, ?, ?, '', ?, ?)
+ON CONFLICT(site) DO UPDATE SET
+  url=excluded.url,
+  ts_ms=excluded.ts_ms,
+  snapshot_hash=excluded.snapshot_hash,
+  links_json=excluded.links_json,
+  links_blob=excluded.links_blob,
+  links_count=excluded.links_count;
+"""
 
 
 def now_epoch_ms() -> int:
     return int(time.time() * 1000)
 
 
-def stable_json_dumps(obj) -> str:
-    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+def encode_links(links: Sequence[str]) -> bytes:
+    """
+    Newline-joined, zlib-compressed link list. Career-page URLs share long
+    prefixes, so this is several times smaller than the JSON array.
+    Links never contain newlines (the Node extractor emits one per line).
+    """
+    return zlib.compress("\n".join(links).encode("utf-8"))
+
+
+def decode_links(blob: bytes) -> List[str]:
+    text = zlib.decompress(blob).decode("utf-8")
+    return text.split("\n") if text else []
+
+
+def decode_added_urls(row: sqlite3.Row) -> List[str]:
+    """
+    added_urls of a diff_queue row; rows enqueued before added_urls_blob
+    existed still carry them as JSON text.
+    """
+    return _decode_added_urls(row["added_urls_json"], row["added_urls_blob"])
+
+
+def _decode_added_urls(added_urls_json: str, added_urls_blob: Optional[bytes]) -> List[str]:
+    if added_urls_blob is not None:
+        return decode_links(added_urls_blob)
+    return json_loads(added_urls_json)
+
+
+class PendingDiff:
+    """
+    A diff_queue row from fetch_pending. added_urls is decoded on first
+    access, so listing the queue does not inflate every URL list.
+    """
+
+    __slots__ = (
+        "id",
+        "site",
+        "created_ts_ms",
+        "diff_hash",
+        "status",
+        "attempts",
+        "last_error",
+        "_added_urls_json",
+        "_added_urls_blob",
+        "_added_urls",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        site: str,
+        created_ts_ms: int,
+        diff_hash: bytes,
+        added_urls_json: str,
+        added_urls_blob: Optional[bytes],
+        status: str,
+        attempts: int,
+        last_error: Optional[str],
+    ):
+        self.id = id
+        self.site = site
+        self.created_ts_ms = created_ts_ms
+        self.diff_hash = diff_hash
+        self.status = status
+        self.attempts = attempts
+        self.last_error = last_error
+        self._added_urls_json = added_urls_json
+        self._added_urls_blob = added_urls_blob
+        self._added_urls: Optional[List[str]] = None
+
+    @property
+    def added_urls(self) -> List[str]:
+        if self._added_urls is None:
+            self._added_urls = _decode_added_urls(self._added_urls_json, self._added_urls_blob)
+        return self._added_urls
+
+    def __repr__(self) -> str:
+        return f"PendingDiff(id={self.id!r}, site={self.site!r}, status={self.status!r}, attempts={self.attempts!r})"
+
+
+class ReadyJob(NamedTuple):
+    site: str
+    url: str
+    job_title: str
+    min_years: int
+    created_ts_ms: int
 
 
 @dataclass(frozen=True)
@@ -22,7 +133,7 @@ class SnapshotRow:
     site: str
     url: str
     ts_ms: int
-    snapshot_hash: str
+    snapshot_hash: bytes
     links: List[str]
 
 
@@ -42,18 +153,64 @@ class SQLiteState:
     def __init__(self, db_path: str):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
-        self.conn = sqlite3.connect(db_path, timeout=30)
+        # check_same_thread=False lets an owner close per-thread connections
+        # from the main thread; a connection is still only used by one thread at a time.
+        # cached_statements: room for every statement this class issues, so the
+        # polling loops (claim_*, reap_*) always hit sqlite3's prepared-statement cache.
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, cached_statements=256)
         self.conn.row_factory = sqlite3.Row
+        # One cursor reused by every method (each one executes and fetches
+        # before returning), instead of allocating a cursor per call.
+        self._cur = self.conn.cursor()
+        self._batch_depth = 0
         self._init_db()
 
     def close(self) -> None:
         self.conn.close()
 
+    def __enter__(self) -> "SQLiteState":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _commit(self) -> None:
+        if self._batch_depth == 0:
+            self.conn.commit()
+
+    @contextmanager
+    def transaction(self) -> Iterator["SQLiteState"]:
+        """
+        with state.transaction(): runs the enclosed mutators as one
+        BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises.
+        Nests inside another transaction(); only the outermost commits.
+        """
+        outer = self._batch_depth == 0
+        if outer and not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE;")
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if outer:
+                self.conn.rollback()
+            raise
+        self._batch_depth -= 1
+        if outer:
+            self.conn.commit()
+
     def _init_db(self) -> None:
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute("PRAGMA journal_mode=WAL;")
         cur.execute("PRAGMA synchronous=NORMAL;")
         cur.execute("PRAGMA temp_store=MEMORY;")
+        cur.execute("PRAGMA mmap_size=268435456;")
+        # Per-connection settings, so they are re-issued on every open.
+        # busy_timeout is left to connect(timeout=30); a PRAGMA here would lower it.
+        cur.execute("PRAGMA cache_size=-20000;")
+        cur.execute("PRAGMA wal_autocheckpoint=1000;")
+        cur.execute("PRAGMA journal_size_limit=6144000;")
 
         cur.execute(
             """
@@ -62,8 +219,10 @@ class SQLiteState:
               site TEXT NOT NULL,
               url TEXT NOT NULL,
               ts_ms INTEGER NOT NULL,
-              snapshot_hash TEXT NOT NULL,
-              links_json TEXT NOT NULL
+              snapshot_hash BLOB NOT NULL,
+              links_json TEXT NOT NULL,
+              links_blob BLOB,
+              links_count INTEGER
             );
             """
         )
@@ -80,8 +239,10 @@ class SQLiteState:
               site TEXT PRIMARY KEY,
               url TEXT NOT NULL,
               ts_ms INTEGER NOT NULL,
-              snapshot_hash TEXT NOT NULL,
-              links_json TEXT NOT NULL
+              snapshot_hash BLOB NOT NULL,
+              links_json TEXT NOT NULL,
+              links_blob BLOB,
+              links_count INTEGER
             );
             """
         )
@@ -92,8 +253,9 @@ class SQLiteState:
               id INTEGER PRIMARY KEY AUTOINCREMENT,
               site TEXT NOT NULL,
               created_ts_ms INTEGER NOT NULL,
-              diff_hash TEXT NOT NULL,
+              diff_hash BLOB NOT NULL,
               added_urls_json TEXT NOT NULL,
+              added_urls_blob BLOB,
               status TEXT NOT NULL DEFAULT 'PENDING',
               attempts INTEGER NOT NULL DEFAULT 0,
               last_error TEXT
@@ -166,10 +328,18 @@ class SQLiteState:
             ON job_details(site, url);
             """
         )
+        # idx_job_details_email(include_job, emailed_ts_ms, created_ts_ms) is
+        # superseded by idx_job_details_ready below and no query filters on
+        # include_job; drop it so job_details writes stop maintaining it.
+        cur.execute("DROP INDEX IF EXISTS idx_job_details_email;")
+        # Partial covering index for list_jobs_ready_for_email: only unsent
+        # candidates are indexed, walked newest first without touching the table.
+        # Its WHERE must stay textually implied by that query's WHERE.
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_job_details_email
-            ON job_details(include_job, emailed_ts_ms, created_ts_ms);
+            CREATE INDEX IF NOT EXISTS idx_job_details_ready
+            ON job_details(created_ts_ms, site, url, job_title, min_years, emailed_ts_ms)
+            WHERE emailed_ts_ms IS NULL AND min_years < 4;
             """
         )
 
@@ -180,21 +350,51 @@ class SQLiteState:
         self._ensure_column("diff_queue", "claimed_ts_ms", "INTEGER")
         self._ensure_column("diff_queue", "updated_ts_ms", "INTEGER")
         self._ensure_column("diff_queue", "backoff_until_ms", "INTEGER")
+        self._ensure_column("diff_queue", "added_urls_blob", "BLOB")
+        for table in ("snapshots", "current_snapshot"):
+            self._ensure_column(table, "links_blob", "BLOB")
+            self._ensure_column(table, "links_count", "INTEGER")
+        # Older DBs hold snapshot_hash / diff_hash as hex TEXT from the old
+        # hashing scheme. They are left as is: no newly computed BLOB hash can
+        # equal one, and current_snapshot rows are overwritten on the next run.
 
     def _ensure_column(self, table: str, column: str, col_type: str) -> None:
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute(f"PRAGMA table_info({table});")
         cols = {row["name"] for row in cur.fetchall()}
         if column in cols:
             return
-        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type};")
+        try:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type};")
+        except sqlite3.OperationalError as e:
+            # Another connection opened the same DB and added it first.
+            if "duplicate column name" not in str(e):
+                raise
         self.conn.commit()
 
     def get_current_links(self, site: str) -> Optional[List[str]]:
-        cur = self.conn.cursor()
+        cur = self._cur
+        cur.execute(
+            """
+            SELECT links_blob, links_json
+            FROM current_snapshot
+            WHERE site = ?;
+            """,
+            (site,),
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+        if row["links_blob"] is not None:
+            return decode_links(row["links_blob"])
+        # Rows written before links_blob existed.
+        return json_loads(row["links_json"])
+
+    def get_current_snapshot_hash(self, site: str) -> Optional[bytes]:
+        cur = self._cur
         cur.execute(
             """
-            SELECT links_json
+            SELECT snapshot_hash
             FROM current_snapshot
             WHERE site = ?;
             """,
@@ -203,7 +403,7 @@ class SQLiteState:
         row = cur.fetchone()
         if not row:
             return None
-        return json.loads(row["links_json"])
+        return row["snapshot_hash"]
 
     def upsert_snapshot(self, snapshot: SnapshotRow) -> None:
         """
@@ -211,80 +411,102 @@ class SQLiteState:
         - Always append to snapshots history
         - Update current_snapshot to point to latest
         """
-        cur = self.conn.cursor()
-        cur.execute("BEGIN;")
+        # Encoded once and bound to both statements.
+        params = (
+            snapshot.site,
+            snapshot.url,
+            snapshot.ts_ms,
+            snapshot.snapshot_hash,
+            encode_links(snapshot.links),
+            len(snapshot.links),
+        )
+        cur = self._cur
+        batched = self._batch_depth > 0
+        if not batched:
+            cur.execute("BEGIN;")
         try:
-            cur.execute(
-                """
-                INSERT INTO snapshots(site, url, ts_ms, snapshot_hash, links_json)
-                VALUES(?, ?, ?, ?, ?);
-                """,
-                (
-                    snapshot.site,
-                    snapshot.url,
-                    snapshot.ts_ms,
-                    snapshot.snapshot_hash,
-                    stable_json_dumps(snapshot.links),
-                ),
-            )
-            cur.execute(
-                """
-                INSERT INTO current_snapshot(site, url, ts_ms, snapshot_hash, links_json)
-                VALUES(?, ?, ?, ?, ?)
-                ON CONFLICT(site) DO UPDATE SET
-                  url=excluded.url,
-                  ts_ms=excluded.ts_ms,
-                  snapshot_hash=excluded.snapshot_hash,
-                  links_json=excluded.links_json;
-                """,
-                (
-                    snapshot.site,
-                    snapshot.url,
-                    snapshot.ts_ms,
-                    snapshot.snapshot_hash,
-                    stable_json_dumps(snapshot.links),
-                ),
-            )
-            self.conn.commit()
+            cur.execute(_INSERT_SNAPSHOT_SQL, params)
+            cur.execute(_UPSERT_CURRENT_SNAPSHOT_SQL, params)
+            self._commit()
         except Exception:
-            self.conn.rollback()
+            if not batched:
+                self.conn.rollback()
             raise
 
+    def upsert_snapshots(self, snapshots: Sequence[SnapshotRow]) -> None:
+        """
+        Bulk upsert_snapshot: every row in one transaction, one executemany
+        per table, so a batch of companies shares one commit.
+        """
+        if not snapshots:
+            return
+        params = [
+            (s.site, s.url, s.ts_ms, s.snapshot_hash, encode_links(s.links), len(s.links))
+            for s in snapshots
+        ]
+        with self.transaction():
+            self._cur.executemany(_INSERT_SNAPSHOT_SQL, params)
+            self._cur.executemany(_UPSERT_CURRENT_SNAPSHOT_SQL, params)
+
     def enqueue_diff(
         self,
         *,
         site: str,
-        diff_hash: str,
+        diff_hash: bytes,
         added_urls: Sequence[str],
     ) -> bool:
         """
         Returns True if enqueued, False if already exists due to idempotency.
         """
-        cur = self.conn.cursor()
-        try:
-            cur.execute(
+        cur = self._cur
+        # OR IGNORE instead of catching IntegrityError: a rollback here would
+        # also discard an enclosing transaction().
+        # added_urls_json is kept NOT NULL for older schemas; added_urls_blob holds the data.
+        cur.execute(
+            """
+            INSERT OR IGNORE INTO diff_queue(site, created_ts_ms, diff_hash, added_urls_json, added_urls_blob)
+            VALUES(?, ?, ?, '', ?);
+            """,
+            (
+                site,
+                now_epoch_ms(),
+                diff_hash,
+                encode_links(added_urls),
+            ),
+        )
+        self._commit()
+        return cur.rowcount == 1
+
+    def enqueue_diffs(self, diffs: Sequence[DiffPayload]) -> int:
+        """
+        Bulk enqueue_diff in one transaction. Returns how many rows were newly
+        enqueued (diffs already present by (site, diff_hash) are ignored).
+        The batch runners write through this via run_common.WriteBatch.
+        """
+        now = now_epoch_ms()
+        params = [(d.site, now, d.diff_hash, encode_links(d.added_urls)) for d in diffs]
+        if not params:
+            return 0
+        with self.transaction():
+            before = self.conn.total_changes
+            self.conn.executemany(
                 """
-                INSERT INTO diff_queue(site, created_ts_ms, diff_hash, added_urls_json)
-                VALUES(?, ?, ?, ?);
+                INSERT OR IGNORE INTO diff_queue(site, created_ts_ms, diff_hash, added_urls_json, added_urls_blob)
+                VALUES(?, ?, ?, '', ?);
                 """,
-                (
-                    site,
-                    now_epoch_ms(),
-                    diff_hash,
-                    stable_json_dumps(list(added_urls)),
-                ),
+                params,
             )
-            self.conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            self.conn.rollback()
-            return False
+            return self.conn.total_changes - before
 
-    def fetch_pending(self, limit: int = 50) -> List[dict]:
+    def fetch_pending(self, limit: int = 50) -> List[PendingDiff]:
+        # Own cursor, so row_factory=None does not leak onto the shared self._cur.
+        # Plain tuples (no sqlite3.Row) straight into PendingDiff's positional args;
+        # the column order below must match PendingDiff.__init__.
         cur = self.conn.cursor()
+        cur.row_factory = None
         cur.execute(
             """
-            SELECT id, site, created_ts_ms, diff_hash, added_urls_json, status, attempts, last_error
+            SELECT id, site, created_ts_ms, diff_hash, added_urls_json, added_urls_blob, status, attempts, last_error
             FROM diff_queue
             WHERE status = 'PENDING'
             ORDER BY created_ts_ms ASC
@@ -292,32 +514,17 @@ class SQLiteState:
             """,
             (limit,),
         )
-        rows = cur.fetchall()
-        out: List[dict] = []
-        for r in rows:
-            out.append(
-                {
-                    "id": r["id"],
-                    "site": r["site"],
-                    "created_ts_ms": r["created_ts_ms"],
-                    "diff_hash": r["diff_hash"],
-                    "added_urls": json.loads(r["added_urls_json"]),
-                    "status": r["status"],
-                    "attempts": r["attempts"],
-                    "last_error": r["last_error"],
-                }
-            )
-        return out
+        return [PendingDiff(*r) for r in cur.fetchall()]
 
     def clear_diff_queue(self) -> int:
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute("DELETE FROM diff_queue;")
-        self.conn.commit()
+        self._commit()
         return cur.rowcount
 
     def reap_stuck_diffs(self, timeout_ms: int = 10 * 60 * 1000) -> int:
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute(
             """
             UPDATE diff_queue
@@ -331,12 +538,46 @@ class SQLiteState:
             """,
             (now, now - timeout_ms),
         )
-        self.conn.commit()
+        self._commit()
         return cur.rowcount
 
     def claim_diff_row(self, owner: str) -> Optional[sqlite3.Row]:
+        """
+        Atomically moves the oldest ready PENDING diff to IN_PROGRESS and
+        returns it (as updated), or None when nothing is ready.
+        """
+        if not HAS_RETURNING:
+            return self._claim_diff_row_compat(owner)
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
+        cur.execute(
+            """
+            UPDATE diff_queue
+            SET status = 'IN_PROGRESS',
+                owner = ?,
+                claimed_ts_ms = ?,
+                updated_ts_ms = ?,
+                attempts = attempts + 1
+            WHERE id = (
+              SELECT id
+              FROM diff_queue
+              WHERE status = 'PENDING'
+                AND (backoff_until_ms IS NULL OR backoff_until_ms <= ?)
+              ORDER BY created_ts_ms ASC
+              LIMIT 1
+            )
+            RETURNING *;
+            """,
+            (owner, now, now, now),
+        )
+        rows = cur.fetchall()
+        self._commit()
+        return rows[0] if rows else None
+
+    def _claim_diff_row_compat(self, owner: str) -> Optional[sqlite3.Row]:
+        # SQLite < 3.35: SELECT then UPDATE under BEGIN IMMEDIATE.
+        now = now_epoch_ms()
+        cur = self._cur
         cur.execute("BEGIN IMMEDIATE;")
         try:
             cur.execute(
@@ -377,7 +618,7 @@ class SQLiteState:
 
     def mark_diff_done(self, diff_id: int) -> None:
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute(
             """
             UPDATE diff_queue
@@ -387,11 +628,11 @@ class SQLiteState:
             """,
             (now, diff_id),
         )
-        self.conn.commit()
+        self._commit()
 
     def mark_diff_failed(self, diff_id: int, error: str, backoff_ms: int = 30_000) -> None:
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute(
             """
             UPDATE diff_queue
@@ -403,27 +644,29 @@ class SQLiteState:
             """,
             (error, now + backoff_ms, now, diff_id),
         )
-        self.conn.commit()
+        self._commit()
 
-    def add_job_tasks(self, *, site: str, urls: Sequence[str]) -> int:
-        if not urls:
-            return 0
+    def add_job_tasks(self, *, site: str, urls: Iterable[str]) -> int:
+        """
+        Inserts every URL with one executemany inside one BEGIN IMMEDIATE
+        transaction (or the caller's). `urls` may be any iterable, including a
+        generator; it is streamed, never copied.
+        """
         now = now_epoch_ms()
-        cur = self.conn.cursor()
-        before = self.conn.total_changes
-        cur.executemany(
-            """
-            INSERT OR IGNORE INTO job_tasks(site, url, status, created_ts_ms, updated_ts_ms)
-            VALUES(?, ?, 'PENDING', ?, ?);
-            """,
-            [(site, str(u), now, now) for u in urls],
-        )
-        self.conn.commit()
-        return self.conn.total_changes - before
+        with self.transaction():
+            before = self.conn.total_changes
+            self._cur.executemany(
+                """
+                INSERT OR IGNORE INTO job_tasks(site, url, status, created_ts_ms, updated_ts_ms)
+                VALUES(?, ?, 'PENDING', ?, ?);
+                """,
+                ((site, u if type(u) is str else str(u), now, now) for u in urls),
+            )
+            return self.conn.total_changes - before
 
     def reap_stuck_job_tasks(self, timeout_ms: int = 10 * 60 * 1000) -> int:
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute(
             """
             UPDATE job_tasks
@@ -435,12 +678,12 @@ class SQLiteState:
             """,
             (now, now - timeout_ms),
         )
-        self.conn.commit()
+        self._commit()
         return cur.rowcount
 
     def mark_over_attempt_limit_job_tasks_failed(self, max_attempts: int, reason: str | None = None) -> int:
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         msg = reason or f"max_attempts_exceeded attempts>{max_attempts}"
         cur.execute(
             """
@@ -457,12 +700,48 @@ class SQLiteState:
             """,
             (msg, now, max_attempts),
         )
-        self.conn.commit()
+        self._commit()
         return cur.rowcount
 
     def claim_job_task(self, owner: str, max_attempts: int = 3) -> Optional[Tuple[str, str]]:
+        """
+        Atomically moves the oldest ready PENDING/FAILED task to IN_PROGRESS
+        and returns (url, site), or None when nothing is ready.
+        """
+        if not HAS_RETURNING:
+            return self._claim_job_task_compat(owner, max_attempts)
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
+        cur.execute(
+            """
+            UPDATE job_tasks
+            SET status = 'IN_PROGRESS',
+                owner = ?,
+                updated_ts_ms = ?,
+                attempts = attempts + 1
+            WHERE id = (
+              SELECT id
+              FROM job_tasks
+              WHERE status IN ('PENDING', 'FAILED')
+                AND (backoff_until_ms IS NULL OR backoff_until_ms <= ?)
+                AND attempts <= ?
+              ORDER BY created_ts_ms ASC
+              LIMIT 1
+            )
+            RETURNING url, site;
+            """,
+            (owner, now, now, max_attempts),
+        )
+        rows = cur.fetchall()
+        self._commit()
+        if not rows:
+            return None
+        return (rows[0]["url"], rows[0]["site"])
+
+    def _claim_job_task_compat(self, owner: str, max_attempts: int) -> Optional[Tuple[str, str]]:
+        # SQLite < 3.35: SELECT then UPDATE under BEGIN IMMEDIATE.
+        now = now_epoch_ms()
+        cur = self._cur
         cur.execute("BEGIN IMMEDIATE;")
         try:
             cur.execute(
@@ -503,7 +782,7 @@ class SQLiteState:
 
     def complete_job_task(self, url: str) -> None:
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute(
             """
             UPDATE job_tasks
@@ -513,11 +792,11 @@ class SQLiteState:
             """,
             (now, url),
         )
-        self.conn.commit()
+        self._commit()
 
     def fail_job_task(self, url: str, error: str, backoff_ms: int = 30_000) -> None:
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute(
             """
             UPDATE job_tasks
@@ -529,7 +808,7 @@ class SQLiteState:
             """,
             (error, now + backoff_ms, now, url),
         )
-        self.conn.commit()
+        self._commit()
 
     def upsert_job_details(
         self,
@@ -540,10 +819,21 @@ class SQLiteState:
         min_years: int,
         include_job: bool,
         exclude_reason: Optional[str],
-        raw_json: Dict[str, Any],
+        raw_json: Dict[str, Any] | str | bytes,
     ) -> None:
+        """
+        raw_json may already be serialized (str or UTF-8 bytes), e.g. the
+        extractor's stdout; it is then stored as is instead of re-encoded.
+        """
+        if isinstance(raw_json, bytes):
+            # Decoded so the column keeps TEXT affinity rather than storing a BLOB.
+            raw_text = raw_json.decode("utf-8")
+        elif isinstance(raw_json, str):
+            raw_text = raw_json
+        else:
+            raw_text = json_dumps(raw_json, default=str)
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         cur.execute(
             """
             INSERT INTO job_details(
@@ -566,18 +856,20 @@ class SQLiteState:
                 int(min_years),
                 1 if include_job else 0,
                 exclude_reason,
-                json.dumps(raw_json, ensure_ascii=False),
+                raw_text,
                 now,
                 now,
             ),
         )
-        self.conn.commit()
+        self._commit()
 
-    def list_jobs_ready_for_email(self, limit: int = 200) -> List[Dict[str, Any]]:
+    def list_jobs_ready_for_email(self, limit: int = 200) -> List[ReadyJob]:
+        # Own cursor: row_factory=None must not leak onto the shared self._cur.
         cur = self.conn.cursor()
+        cur.row_factory = None
         cur.execute(
             """
-            SELECT site, url, job_title, min_years, created_ts_ms
+            SELECT site, url, COALESCE(job_title, ''), min_years, created_ts_ms
             FROM job_details
             WHERE min_years < 4
               AND emailed_ts_ms IS NULL
@@ -586,25 +878,13 @@ class SQLiteState:
             """,
             (limit,),
         )
-        rows = cur.fetchall()
-        out: List[Dict[str, Any]] = []
-        for r in rows:
-            out.append(
-                {
-                    "site": r["site"],
-                    "url": r["url"],
-                    "job_title": r["job_title"] or "",
-                    "min_years": int(r["min_years"]),
-                    "created_ts_ms": r["created_ts_ms"],
-                }
-            )
-        return out
+        return list(map(ReadyJob._make, cur.fetchall()))
 
     def mark_jobs_emailed(self, *, urls: Sequence[str], digest_id: str) -> int:
         if not urls:
             return 0
         now = now_epoch_ms()
-        cur = self.conn.cursor()
+        cur = self._cur
         before = self.conn.total_changes
         cur.executemany(
             """
@@ -613,7 +893,36 @@ class SQLiteState:
                 digest_id = ?
             WHERE url = ? AND emailed_ts_ms IS NULL;
             """,
-            [(now, digest_id, str(u)) for u in urls],
+            ((now, digest_id, u if type(u) is str else str(u)) for u in urls),
         )
-        self.conn.commit()
+        self._commit()
         return self.conn.total_changes - before
+
+
+class ThreadLocalStates:
+    """
+    One SQLiteState per thread, opened on that thread's first get() and reused
+    for everything it handles afterwards; close_all() closes every one.
+    WAL mode lets these connections read concurrently with a writer.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._tls = threading.local()
+        self._lock = threading.Lock()
+        self._opened: List[SQLiteState] = []
+
+    def get(self) -> SQLiteState:
+        state = getattr(self._tls, "state", None)
+        if state is None:
+            state = SQLiteState(self.db_path)
+            self._tls.state = state
+            with self._lock:
+                self._opened.append(state)
+        return state
+
+    def close_all(self) -> None:
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for state in opened:
+            state.close()
@@ -2,34 +2,44 @@
 from __future__ import annotations
 
 import hashlib
-import json
 from dataclasses import dataclass
+from itertools import islice
 from typing import Iterable, List, Set, Tuple
 
 
-def stable_json_dumps(obj) -> str:
-    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+def content_hash(data: bytes) -> bytes:
+    # Change detection / idempotency keys only, not security: blake2b is
+    # faster than sha256 in hashlib and keeps a 256-bit digest.
+    # Raw 32-byte digest: stored as a BLOB, half the size of hex TEXT.
+    return hashlib.blake2b(data, digest_size=32).digest()
 
 
-def sha256_hex(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+_LINES_PER_UPDATE = 4096
 
 
-def dedupe_preserve_order(items: Iterable[str]) -> List[str]:
-    seen: Set[str] = set()
-    out: List[str] = []
-    for x in items:
-        if x not in seen:
-            seen.add(x)
-            out.append(x)
-    return out
+def content_hash_lines(lines: Iterable[str], prefix: bytes = b"") -> bytes:
+    """
+    content_hash(prefix + "\n".join(lines).encode("utf-8")), fed to the
+    hasher in chunks so the whole joined string is never built. Accepts any
+    iterable.
+    """
+    h = hashlib.blake2b(prefix, digest_size=32)
+    it = iter(lines)
+    sep = b""
+    for chunk in iter(lambda: list(islice(it, _LINES_PER_UPDATE)), []):
+        h.update(sep)
+        h.update("\n".join(chunk).encode("utf-8"))
+        sep = b"\n"
+    return h.digest()
 
 
 def diff_links(old_links: Iterable[str], new_links: Iterable[str]) -> Tuple[Set[str], Set[str]]:
-    old_set = set(old_links)
-    new_set = set(new_links)
-    added = new_set - old_set
-    removed = old_set - new_set
+    # Each side is hashed into a set once; callers that already hold sets
+    # skip that copy.
+    old_set = old_links if isinstance(old_links, set) else set(old_links)
+    new_set = new_links if isinstance(new_links, set) else set(new_links)
+    added = new_set.difference(old_set)
+    removed = old_set.difference(new_set)
     return added, removed
 
 
@@ -37,17 +47,16 @@ def diff_links(old_links: Iterable[str], new_links: Iterable[str]) -> Tuple[Set[
 class DiffPayload:
     site: str
     added_urls: List[str]
-    diff_hash: str
+    diff_hash: bytes
 
 
 def build_diff_payload(site: str, added_urls: Set[str]) -> DiffPayload:
-    payload_obj = {
-        "site": site,
-        "added_urls": sorted(added_urls),
-    }
-    diff_hash = sha256_hex(stable_json_dumps(payload_obj))
+    added = sorted(added_urls)
+    # Hashed as bytes: site, NUL, newline-joined URLs (no JSON round trip).
+    # URLs never contain newlines and site names never contain NUL.
+    diff_hash = content_hash_lines(added, prefix=site.encode("utf-8") + b"\0")
     return DiffPayload(
         site=site,
-        added_urls=payload_obj["added_urls"],
+        added_urls=added,
         diff_hash=diff_hash,
     )
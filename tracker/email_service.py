@@ -12,11 +12,12 @@ import datetime
 from zoneinfo import ZoneInfo
 import csv
 from email.message import EmailMessage
-from typing import Any, Dict, List
+from html import escape as _html_escape
+from typing import List, Tuple
 
 from dotenv import load_dotenv
 
-from tracker.db import SQLiteState
+from tracker.db import ReadyJob, SQLiteState
 
 LOG = logging.getLogger("tracker.email_service")
 
@@ -31,74 +32,46 @@ def digest_id(owner: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()[:16]
 
 
-def format_markdown_digest(jobs: List[Dict[str, Any]]) -> str:
+def _digest_row(j: ReadyJob) -> Tuple[str, str, str, int]:
+    return (
+        str(j.site).strip() or "Unknown",
+        str(j.job_title).strip() or "Untitled",
+        str(j.url).strip(),
+        int(j.min_years or 0),
+    )
+
+
+def format_markdown_digest(jobs: List[ReadyJob]) -> str:
     """
     Group by site, sorted by created_ts_ms desc already.
     """
-    lines: List[str] = []
-    lines.append("# Job alerts")
-    lines.append("")
-    lines.append(f"Total new jobs: {len(jobs)}")
-    lines.append("")
-    lines.append("| Company | Job title | URL | Min years |")
-    lines.append("|---|---|---|---|")
-
-    for j in jobs:
-        site = str(j.get("site", "")).strip() or "Unknown"
-        title = str(j.get("job_title", "")).strip() or "Untitled"
-        url = str(j.get("url", "")).strip()
-        yrs = int(j.get("min_years", 0) or 0)
-        link = f"[Link]({url})" if url else "Link"
-        lines.append(f"| {site} | {title} | {link} | {yrs} |")
-
-    return "\n".join(lines).strip() + "\n"
-
-def format_plaintext_digest(jobs: List[Dict[str, Any]]) -> str:
-    lines: List[str] = []
-    lines.append("Job alerts")
-    lines.append("")
-    lines.append(f"Total new jobs: {len(jobs)}")
-    lines.append("")
-    for j in jobs:
-        site = str(j.get("site", "")).strip() or "Unknown"
-        title = str(j.get("job_title", "")).strip() or "Untitled"
-        url = str(j.get("url", "")).strip()
-        yrs = int(j.get("min_years", 0) or 0)
-        lines.append(f"- {site} | {title} | min years: {yrs}")
-        if url:
-            lines.append(f"  {url}")
-    lines.append("")
-    return "\n".join(lines).strip() + "\n"
-
-
-def _html_escape(s: str) -> str:
+    rows = "".join(
+        f"| {site} | {title} | {f'[Link]({url})' if url else 'Link'} | {yrs} |\n"
+        for site, title, url, yrs in map(_digest_row, jobs)
+    )
     return (
-        s.replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-        .replace("'", "&#39;")
+        "# Job alerts\n\n"
+        f"Total new jobs: {len(jobs)}\n\n"
+        "| Company | Job title | URL | Min years |\n"
+        "|---|---|---|---|\n"
+        f"{rows}"
+    ).strip() + "\n"
+
+def format_plaintext_digest(jobs: List[ReadyJob]) -> str:
+    rows = "".join(
+        f"- {site} | {title} | min years: {yrs}\n" + (f"  {url}\n" if url else "")
+        for site, title, url, yrs in map(_digest_row, jobs)
     )
+    return f"Job alerts\n\nTotal new jobs: {len(jobs)}\n\n{rows}".strip() + "\n"
+
+
+def _html_row(site: str, title: str, url: str, yrs: int) -> str:
+    link = f'<a href="{_html_escape(url)}">Link</a>' if url else "Link"
+    return f"<tr><td>{_html_escape(site)}</td><td>{_html_escape(title)}</td><td>{link}</td><td>{yrs}</td></tr>"
 
 
-def format_html_digest(jobs: List[Dict[str, Any]]) -> str:
-    rows: List[str] = []
-    for j in jobs:
-        site = _html_escape(str(j.get("site", "")).strip() or "Unknown")
-        title = _html_escape(str(j.get("job_title", "")).strip() or "Untitled")
-        url = str(j.get("url", "")).strip()
-        yrs = int(j.get("min_years", 0) or 0)
-        link = f'<a href="{_html_escape(url)}">Link</a>' if url else "Link"
-        rows.append(
-            f"<tr>"
-            f"<td>{site}</td>"
-            f"<td>{title}</td>"
-            f"<td>{link}</td>"
-            f"<td>{yrs}</td>"
-            f"</tr>"
-        )
-
-    rows_html = "\n".join(rows)
+def format_html_digest(jobs: List[ReadyJob]) -> str:
+    rows_html = "\n".join(_html_row(*_digest_row(j)) for j in jobs)
     return (
         "<html><body>"
         "<h1>Job alerts</h1>"
@@ -115,12 +88,62 @@ def format_html_digest(jobs: List[Dict[str, Any]]) -> str:
     )
 
 
+class SmtpSender:
+    """
+    One logged-in SMTP_SSL session reused by every send() until close(), so
+    the TLS handshake and LOGIN are paid once rather than per message.
+    """
+
+    def __init__(self, *, host: str, port: int, user: str, password: str, timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self._smtp: smtplib.SMTP_SSL | None = None
+
+    def __enter__(self) -> "SmtpSender":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _connect(self) -> smtplib.SMTP_SSL:
+        smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        smtp.login(self.user, self.password)
+        return smtp
+
+    def _session_alive(self, smtp: smtplib.SMTP_SSL) -> bool:
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, msg: EmailMessage) -> None:
+        # A dropped idle session is detected with NOOP before anything is sent.
+        # send_message itself is never retried: a disconnect there may come
+        # after the server accepted DATA, and resending could send the digest twice.
+        if self._smtp is not None and not self._session_alive(self._smtp):
+            self._smtp.close()
+            self._smtp = None
+        if self._smtp is None:
+            self._smtp = self._connect()
+        self._smtp.send_message(msg)
+
+    def close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+
 def send_email_digest(
     *,
-    smtp_host: str,
-    smtp_port: int,
-    smtp_user: str,
-    smtp_pass: str,
+    sender: SmtpSender,
     email_from: str,
     email_to: str,
     subject: str,
@@ -144,9 +167,7 @@ def send_email_digest(
         except Exception:
             LOG.exception("failed_to_attach_file path=%s", attach_path)
 
-    with smtplib.SMTP_SSL(smtp_host, smtp_port) as s:
-        s.login(smtp_user, smtp_pass)
-        s.send_message(msg)
+    sender.send(msg)
 
 
 def main() -> None:
@@ -179,79 +200,83 @@ def main() -> None:
     owner = f"{socket.gethostname()}:{os.getpid()}"
     did = digest_id(owner)
 
+    # One connection for the whole run: the read before sending and the
+    # mark-emailed write after it.
     state = SQLiteState(args.db)
-    jobs = state.list_jobs_ready_for_email(limit=args.limit)
-    state.close()
-
-    if not jobs:
-        LOG.info("no_jobs_ready")
-        return
-
-    # Safety filter: only include jobs with < 4 years of experience.
-    jobs = [j for j in jobs if int(j.get("min_years", 0) or 0) < 4]
-    LOG.info(jobs)
-    if not jobs:
-        LOG.info("no_jobs_ready_after_filter")
-        return
-
-    # Prepare message bodies and CSV path
-    body_text = format_plaintext_digest(jobs)
-    body_html = format_html_digest(jobs)
-    subject = f"Job alerts ({len(jobs)} new)"
-
-    # Record every emailed job to a CSV for auditing/backup BEFORE sending so the
-    # attached CSV contains all jobs up to and including this digest.
-    # Provide separate date and time columns in Mountain Time (AM/PM).
-    now_utc = datetime.datetime.now(datetime.timezone.utc)
     try:
-        mt = now_utc.astimezone(ZoneInfo("America/Denver"))
-    except Exception:
-        # fallback to UTC if zoneinfo unavailable
-        mt = now_utc
-    emailed_date = mt.strftime("%Y-%m-%d")
-    emailed_time = mt.strftime("%I:%M:%S %p").lstrip("0")
-    csv_path = os.getenv("EMAILED_JOBS_CSV", "./state/emailed_jobs.csv")
-    try:
-        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
-        write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
-        with open(csv_path, "a", newline="", encoding="utf-8") as fh:
-            writer = csv.writer(fh)
-            if write_header:
-                # Columns: emailed_date (YYYY-MM-DD), emailed_time (AM/PM Mountain Time), site, url, job_title, min_years
-                writer.writerow(["emailed_date", "emailed_time", "site", "url", "job_title", "min_years"])
-            for j in jobs:
-                try:
-                    site = j.get("site", "")
-                    url = j.get("url", "")
-                    title = j.get("job_title", "")
-                    yrs = int(j.get("min_years", 0) or 0)
-                    writer.writerow([emailed_date, emailed_time, site, url, title, yrs])
-                except Exception:
-                    LOG.exception("failed_to_write_emailed_job row=%s", j)
-    except Exception:
-        LOG.exception("failed_to_append_emailed_jobs_csv")
-
-    # Send email and attach the CSV
-    send_email_digest(
-        smtp_host=smtp_host,
-        smtp_port=smtp_port,
-        smtp_user=smtp_user,
-        smtp_pass=smtp_pass,
-        email_from=email_from,
-        email_to=email_to,
-        subject=subject,
-        body_text=body_text,
-        body_html=body_html,
-        attach_path=csv_path,
-    )
-
-    # After successful send, mark jobs as emailed in the DB
-    urls = [j["url"] for j in jobs]
-    state = SQLiteState(args.db)
-    marked = state.mark_jobs_emailed(urls=urls, digest_id=did)
-    state.close()
-
-    LOG.info("email_sent count=%d digest_id=%s", marked, did)
+        jobs = state.list_jobs_ready_for_email(limit=args.limit)
+
+        if not jobs:
+            LOG.info("no_jobs_ready")
+            return
+
+        # Safety filter: only include jobs with < 4 years of experience.
+        jobs = [j for j in jobs if int(j.min_years or 0) < 4]
+        LOG.info(jobs)
+        if not jobs:
+            LOG.info("no_jobs_ready_after_filter")
+            return
+
+        # Prepare message bodies and CSV path
+        body_text = format_plaintext_digest(jobs)
+        body_html = format_html_digest(jobs)
+        subject = f"Job alerts ({len(jobs)} new)"
+
+        # Record every emailed job to a CSV for auditing/backup BEFORE sending so the
+        # attached CSV contains all jobs up to and including this digest.
+        # Provide separate date and time columns in Mountain Time (AM/PM).
+        now_utc = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            mt = now_utc.astimezone(ZoneInfo("America/Denver"))
+        except Exception:
+            # fallback to UTC if zoneinfo unavailable
+            mt = now_utc
+        emailed_date = mt.strftime("%Y-%m-%d")
+        emailed_time = mt.strftime("%I:%M:%S %p").lstrip("0")
+        csv_path = os.getenv("EMAILED_JOBS_CSV", "./state/emailed_jobs.csv")
+        try:
+            os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+            write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+            with open(csv_path, "a", newline="", encoding="utf-8") as fh:
+                writer = csv.writer(fh)
+                if write_header:
+                    # Columns: emailed_date (YYYY-MM-DD), emailed_time (AM/PM Mountain Time), site, url, job_title, min_years
+                    writer.writerow(["emailed_date", "emailed_time", "site", "url", "job_title", "min_years"])
+                # min_years was already coerced by the safety filter above, so no
+                # per-row error handling is needed; one writerows call does the rest.
+                writer.writerows(
+                    (
+                        emailed_date,
+                        emailed_time,
+                        j.site,
+                        j.url,
+                        j.job_title,
+                        int(j.min_years or 0),
+                    )
+                    for j in jobs
+                )
+        except Exception:
+            LOG.exception("failed_to_append_emailed_jobs_csv")
+
+        # Send email and attach the CSV
+        with SmtpSender(host=smtp_host, port=smtp_port, user=smtp_user, password=smtp_pass) as sender:
+            send_email_digest(
+                sender=sender,
+                email_from=email_from,
+                email_to=email_to,
+                subject=subject,
+                body_text=body_text,
+                body_html=body_html,
+                attach_path=csv_path,
+            )
+
+        # After successful send, mark jobs as emailed in the DB
+        urls = [j.url for j in jobs]
+        marked = state.mark_jobs_emailed(urls=urls, digest_id=did)
+
+        LOG.info("email_sent count=%d digest_id=%s", marked, did)
+    finally:
+        state.close()
 
 
 if __name__ == "__main__":
@@ -2,20 +2,35 @@
 from __future__ import annotations
 
 import argparse
+import itertools
 import json
 import logging
 import os
 import socket
+import sqlite3
 import subprocess
 import time
 import signal
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from urllib.parse import urlparse
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
-from tracker.db import SQLiteState
+from tracker.db import SQLiteState, decode_added_urls
+
+try:
+    import psutil
+except ImportError:  # optional; without it only the process group is killed
+    psutil = None
 
 LOG = logging.getLogger("tracker.inference_worker")
-BLOCKED_HOSTS = {"errors.edgesuite.net"}
+DEFAULT_SIGTERM_TIMEOUT_SECONDS = 5.0
+# Each worker runs its own Chromium and OpenAI calls; scale up explicitly.
+DEFAULT_MAX_WORKERS = 1
+DEFAULT_MAX_OUTPUT_BYTES = 2 * 1024 * 1024
+BLOCKED_HOSTS = frozenset({"errors.edgesuite.net"})
 # URLs containing any of these substrings are skipped
 BLOCKED_URL_SUBSTRINGS = [
     "clickhouse.cloud",
@@ -23,24 +38,34 @@ BLOCKED_URL_SUBSTRINGS = [
 ]
 
 
-def is_http_url(value: str) -> bool:
-    try:
-        u = urlparse(value.strip())
-    except Exception:
-        return False
-    return u.scheme in ("http", "https")
+_HTTP_PREFIXES = ("http://", "https://")
+
+
+@lru_cache(maxsize=1 << 16)
+def _host_of(url_lower: str) -> str:
+    # Slices the hostname out of an already lowercased http(s) URL without
+    # building a ParseResult; bracketed IPv6 hosts go through urlparse.
+    # Cached: a claimed job URL was usually already seen when its diff expanded.
+    netloc = url_lower.partition("://")[2]
+    for sep in "/?#":
+        netloc = netloc.partition(sep)[0]
+    host = netloc.rpartition("@")[2]
+    if host.startswith("["):
+        return urlparse(url_lower).hostname or ""
+    return host.partition(":")[0]
 
 
 def should_skip_url(value: str) -> bool:
-    if not is_http_url(value):
+    url_lower = value.strip().lower()
+    # Prefix test first: non-http(s) values are rejected without urlparse.
+    if not url_lower.startswith(_HTTP_PREFIXES):
         return True
     try:
-        host = urlparse(value.strip()).hostname or ""
+        host = _host_of(url_lower)
     except Exception:
         return True
     if host in BLOCKED_HOSTS:
         return True
-    url_lower = value.strip().lower()
     if any(sub in url_lower for sub in BLOCKED_URL_SUBSTRINGS):
         return True
     return False
@@ -51,6 +76,18 @@ def setup_logging(verbose: bool) -> None:
     logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 
 
+def _popen_new_session(args: List[str], **kwargs) -> subprocess.Popen:
+    # Start processes in their own session so we can kill entire process
+    # groups (node may spawn Chrome children that should be terminated).
+    # If start_new_session is not available on the platform, fall back to
+    # leaving processes as-is and attempting individual kills.
+    try:
+        return subprocess.Popen(args, start_new_session=True, **kwargs)
+    except TypeError:
+        # older Python; fall back to original behaviour
+        return subprocess.Popen(args, **kwargs)
+
+
 def run_pipeline(
     *,
     node_bin: str,
@@ -59,102 +96,80 @@ def run_pipeline(
     extract_experience_py: str,
     url: str,
     timeout_seconds: int,
+    sigterm_timeout_seconds: float = DEFAULT_SIGTERM_TIMEOUT_SECONDS,
+    max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
 ) -> dict:
     """
     Runs:
       node puppeteer_script "url" | python extract_experience.py
-    Returns parsed JSON from extract_experience.py stdout.
+    Returns the JSON object on the first line of extract_experience.py stdout.
+    That line is parsed as soon as it arrives; more than max_output_bytes
+    without a newline aborts the job instead of buffering until timeout.
     """
-    p1 = subprocess.Popen(
+    deadline = time.monotonic() + timeout_seconds
+    p1 = _popen_new_session(
         [node_bin, puppeteer_script, url],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
     )
-    p2 = subprocess.Popen(
+    # Binary stdout: read with a size limit, then parsed directly as bytes.
+    p2 = _popen_new_session(
         [python_bin, extract_experience_py],
         stdin=p1.stdout,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
     if p1.stdout:
         p1.stdout.close()
 
-    # Start processes in their own session so we can kill entire process
-    # groups (node may spawn Chrome children that should be terminated).
-    # Use start_new_session to create a separate session/process group.
-    # Recreate Popen objects with session if not already supported by caller.
-    # (On Python >=3.8, start_new_session is supported.)
-    # If start_new_session is not available on the platform, fallback to
-    # leaving processes as-is and attempting individual kills.
-    try:
-        p1_pg = subprocess.Popen(
-            [node_bin, puppeteer_script, url],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            start_new_session=True,
-        )
-        # connect p2 stdin to p1_pg.stdout
-        p2 = subprocess.Popen(
-            [python_bin, extract_experience_py],
-            stdin=p1_pg.stdout,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            start_new_session=True,
-        )
-        if p1_pg.stdout:
-            p1_pg.stdout.close()
-        p1 = p1_pg
-    except TypeError:
-        # older Python; fall back to original behaviour
-        p1 = subprocess.Popen(
-            [node_bin, puppeteer_script, url],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        p2 = subprocess.Popen(
-            [python_bin, extract_experience_py],
-            stdin=p1.stdout,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        if p1.stdout:
-            p1.stdout.close()
+    # Drain both stderr pipes while p2 runs: Puppeteer can log more than a pipe
+    # buffer holds, and a full pipe would block node (and so p2) until timeout.
+    err1_parts: List[str] = []
+    err2_parts: List[bytes] = []
+    drain1 = threading.Thread(target=lambda: err1_parts.append(p1.stderr.read()), daemon=True)
+    drain2 = threading.Thread(target=lambda: err2_parts.append(p2.stderr.read()), daemon=True)
+    drain1.start()
+    drain2.start()
+
+    # readline(limit) returns at the first newline, so a result is seen as
+    # soon as it is printed and at most max_output_bytes + 1 is ever held.
+    first_line: List[bytes] = []
+    reader = threading.Thread(
+        target=lambda: first_line.append(p2.stdout.readline(max_output_bytes + 1)), daemon=True
+    )
+    reader.start()
 
+    def kill_both() -> None:
+        # Whole process groups, so node's Chrome children go too.
+        _kill_session(p2, sigterm_timeout_seconds)
+        _kill_session(p1, sigterm_timeout_seconds)
+
+    reader.join(timeout=max(0.0, deadline - time.monotonic()))
+    if reader.is_alive():
+        kill_both()
+        raise RuntimeError("pipeline_timeout")
+    out2 = first_line[0]
+    if len(out2) > max_output_bytes:
+        kill_both()
+        raise RuntimeError(f"extract_experience_output_too_large max_output_bytes={max_output_bytes}")
+
+    # Anything p2 prints after its result now fails with EPIPE instead of
+    # filling a pipe nobody reads.
+    p2.stdout.close()
     try:
-        out2, err2 = p2.communicate(timeout=timeout_seconds)
+        p2.wait(timeout=max(0.0, deadline - time.monotonic()))
     except subprocess.TimeoutExpired:
-        # Try to terminate the whole process group for p2 and p1 (if any)
-        try:
-            # kill p2 process
-            p2.kill()
-        except Exception:
-            pass
-        # kill node process group (which includes Chrome children)
-        try:
-            os.killpg(os.getpgid(p1.pid), signal.SIGTERM)
-        except Exception:
-            try:
-                p1.kill()
-            except Exception:
-                pass
-        # give a moment then escalate
-        time.sleep(1)
-        try:
-            os.killpg(os.getpgid(p1.pid), signal.SIGKILL)
-        except Exception:
-            try:
-                p1.kill()
-            except Exception:
-                pass
+        kill_both()
         raise RuntimeError("pipeline_timeout")
 
-    out1, err1 = p1.communicate()
+    p1.wait()
+    drain1.join()
+    drain2.join()
+    p1.stderr.close()
+    p2.stderr.close()
+    err1 = "".join(err1_parts)
+    err2 = b"".join(err2_parts).decode("utf-8", errors="replace")
 
     if p1.returncode != 0:
         raise RuntimeError(f"puppeteer_failed rc={p1.returncode} stderr={(err1 or '')[:800]}")
@@ -162,9 +177,229 @@ def run_pipeline(
         raise RuntimeError(f"extract_experience_failed rc={p2.returncode} stderr={(err2 or '')[:800]}")
 
     try:
-        return json.loads(out2.strip())
+        return json.loads(out2)
     except Exception as e:
-        raise RuntimeError(f"invalid_json_from_extract_experience error={e} raw={(out2 or '')[:800]}")
+        raw = out2[:800].decode("utf-8", errors="replace")
+        raise RuntimeError(f"invalid_json_from_extract_experience error={e} raw={raw}")
+
+
+def _kill_session(proc: subprocess.Popen, sigterm_timeout_seconds: float = DEFAULT_SIGTERM_TIMEOUT_SECONDS) -> None:
+    """
+    Stops proc and everything it started. proc leads its own session (see
+    _popen_new_session), so the whole group gets SIGTERM, then SIGKILL once
+    proc has exited or sigterm_timeout_seconds passed; the group kill also
+    catches Chrome children that outlived node. With psutil installed,
+    descendants that moved to another group are killed too.
+    """
+    descendants = []
+    if psutil is not None:
+        try:
+            descendants = psutil.Process(proc.pid).children(recursive=True)
+        except psutil.Error:
+            pass
+
+    try:
+        pgid: Optional[int] = os.getpgid(proc.pid)
+    except ProcessLookupError:
+        pgid = None
+
+    def signal_group(sig: int) -> None:
+        try:
+            if pgid is not None and pgid != os.getpgrp():
+                os.killpg(pgid, sig)
+            else:
+                proc.send_signal(sig)
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            LOG.warning("kill_failed pid=%d signal=%d error=%s", proc.pid, sig, e)
+
+    signal_group(signal.SIGTERM)
+    try:
+        proc.wait(timeout=sigterm_timeout_seconds)
+    except subprocess.TimeoutExpired:
+        LOG.warning("sigterm_timeout pid=%d timeout_seconds=%s escalating", proc.pid, sigterm_timeout_seconds)
+    signal_group(signal.SIGKILL)
+    proc.wait()
+
+    for child in descendants:
+        try:
+            child.kill()
+        except psutil.Error:
+            pass
+
+
+# Queued in place of a response line longer than _LineServer.max_line_chars.
+_LINE_TOO_LONG = "\0line_too_long"
+
+
+class _LineServer:
+    """
+    One long-lived child answering one JSON line per JSON request line.
+    Started lazily; killed on timeout or EOF and restarted by the next call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        args: List[str],
+        sigterm_timeout_seconds: float = DEFAULT_SIGTERM_TIMEOUT_SECONDS,
+        max_line_chars: int = 0,
+    ):
+        self.name = name
+        self.args = args
+        self.sigterm_timeout_seconds = sigterm_timeout_seconds
+        # 0 = unlimited; otherwise a longer response line kills the server.
+        self.max_line_chars = max_line_chars
+        self._ids = itertools.count(1)
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+
+    def _start(self) -> subprocess.Popen:
+        proc = _popen_new_session(
+            self.args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        threading.Thread(target=self._read_stdout, args=(proc, lines), name=f"{self.name}-stdout", daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(proc,), name=f"{self.name}-stderr", daemon=True).start()
+        self._lines = lines
+        LOG.info("pipeline_server_started name=%s pid=%d", self.name, proc.pid)
+        return proc
+
+    def _read_stdout(self, proc: subprocess.Popen, lines: "queue.Queue[Optional[str]]") -> None:
+        assert proc.stdout is not None
+        limit = self.max_line_chars + 1 if self.max_line_chars else -1
+        while True:
+            line = proc.stdout.readline(limit)
+            if not line:
+                break
+            if self.max_line_chars and len(line) > self.max_line_chars:
+                # Stop reading; request() kills the server on this marker.
+                lines.put(_LINE_TOO_LONG)
+                return
+            lines.put(line)
+        lines.put(None)
+
+    def _read_stderr(self, proc: subprocess.Popen) -> None:
+        assert proc.stderr is not None
+        for line in proc.stderr:
+            if LOG.isEnabledFor(logging.DEBUG):
+                LOG.debug("pipeline_server_stderr name=%s pid=%d %s", self.name, proc.pid, line.rstrip())
+
+    def request(self, payload: dict, deadline: float) -> dict:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = self._start()
+        proc = self._proc
+        req_id = next(self._ids)
+        try:
+            assert proc.stdin is not None
+            proc.stdin.write(json.dumps({"id": req_id, **payload}) + "\n")
+            proc.stdin.flush()
+        except OSError as e:
+            self.kill()
+            raise RuntimeError(f"{self.name}_write_failed error={e}") from e
+
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.kill()
+                raise RuntimeError("pipeline_timeout")
+            if line is None:
+                # stdout hit EOF: the server may still be alive, or may have left
+                # children (e.g. chromium) in its session; reap the whole group.
+                self.kill()
+                raise RuntimeError(f"{self.name}_exited rc={proc.returncode}")
+            if line is _LINE_TOO_LONG:
+                self.kill()
+                raise RuntimeError(f"{self.name}_output_too_large max_chars={self.max_line_chars}")
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                LOG.warning("pipeline_server_bad_line name=%s line=%s", self.name, line[:200])
+                continue
+            if msg.get("id") == req_id:
+                return msg
+
+    def kill(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            _kill_session(proc, self.sigterm_timeout_seconds)
+
+    def close(self, timeout_seconds: int = 10) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            # EOF on stdin lets the server finish and exit on its own.
+            if proc.stdin:
+                proc.stdin.close()
+            proc.wait(timeout=timeout_seconds)
+        except subprocess.TimeoutExpired:
+            _kill_session(proc, self.sigterm_timeout_seconds)
+        except OSError:
+            pass
+
+
+class PersistentPipeline:
+    """
+    run_pipeline without the per-URL process launches: one
+    `node puppeteer_script --server` and one `python extract_experience.py --server`
+    serve every job, so V8, Puppeteer and OpenAI client start-up is paid once
+    per worker. A server that times out or exits is killed and restarted on
+    the next job.
+    """
+
+    def __init__(
+        self,
+        *,
+        node_bin: str,
+        puppeteer_script: str,
+        python_bin: str,
+        extract_experience_py: str,
+        sigterm_timeout_seconds: float = DEFAULT_SIGTERM_TIMEOUT_SECONDS,
+        max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+    ):
+        self.scraper = _LineServer("puppeteer", [node_bin, puppeteer_script, "--server"], sigterm_timeout_seconds)
+        # The extractor answers with a tiny object; json.dumps output is
+        # ASCII, so characters and bytes are the same count here.
+        self.extractor = _LineServer(
+            "extract_experience",
+            [python_bin, extract_experience_py, "--server"],
+            sigterm_timeout_seconds,
+            max_line_chars=max_output_bytes,
+        )
+
+    def __enter__(self) -> "PersistentPipeline":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def run(self, *, url: str, timeout_seconds: int) -> dict:
+        deadline = time.monotonic() + timeout_seconds
+
+        scraped = self.scraper.request({"url": url}, deadline)
+        if scraped.get("error"):
+            raise RuntimeError(f"puppeteer_failed stderr={str(scraped['error'])[:800]}")
+
+        result = self.extractor.request(
+            {"job_title": scraped.get("job_title", ""), "text": scraped.get("text", "")},
+            deadline,
+        )
+        if result.get("error"):
+            raise RuntimeError(f"extract_experience_failed stderr={str(result['error'])[:800]}")
+        result.pop("id", None)
+        return result
+
+    def close(self) -> None:
+        self.scraper.close()
+        self.extractor.close()
 
 
 def expand_one_diff(state: SQLiteState, owner: str) -> int:
@@ -172,19 +407,166 @@ def expand_one_diff(state: SQLiteState, owner: str) -> int:
     if not row:
         return 0
     try:
-        urls = json.loads(row["added_urls_json"])
+        urls = decode_added_urls(row)
         if not isinstance(urls, list):
             urls = []
-        urls = [str(u) for u in urls if u]
-        urls = [u for u in urls if not should_skip_url(u)]
-        inserted = state.add_job_tasks(site=row["site"], urls=urls)
-        state.mark_diff_done(row["id"])
+        # Dedupe first so should_skip_url runs once per distinct URL, and
+        # add_job_tasks' single executemany only sees rows it can insert.
+        # The dict is iterated directly: one filtered list is the only copy.
+        urls = [u for u in dict.fromkeys(map(str, filter(None, urls))) if not should_skip_url(u)]
+        with state.transaction():
+            inserted = state.add_job_tasks(site=row["site"], urls=urls)
+            state.mark_diff_done(row["id"])
         return inserted
     except Exception as e:
         state.mark_diff_failed(row["id"], str(e))
         raise
 
 
+def _exit_on_signal(signum: int, frame) -> None:
+    raise SystemExit(128 + signum)
+
+
+def _reopen(state: SQLiteState, db_path: str) -> SQLiteState:
+    try:
+        state.close()
+    except Exception:
+        pass
+    return SQLiteState(db_path)
+
+
+class _JobBudget:
+    """Counts finished jobs across worker threads against --max-jobs-per-run."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.done = 0
+        self._lock = threading.Lock()
+
+    def record(self) -> bool:
+        """Counts one job; True once the limit (if any) is reached."""
+        with self._lock:
+            self.done += 1
+            return bool(self.limit) and self.done >= self.limit
+
+
+def worker_loop(
+    *,
+    args: argparse.Namespace,
+    owner: str,
+    stop: threading.Event,
+    budget: _JobBudget,
+) -> None:
+    """
+    Claims and runs job tasks until `stop` is set. Each worker thread owns its
+    SQLiteState (WAL lets the connections run side by side) and, unless
+    --pipeline-per-job, its own PersistentPipeline.
+    """
+    # One connection for the worker's lifetime; reopened only after a sqlite error.
+    state = SQLiteState(args.db)
+    pipeline: Optional[PersistentPipeline] = None
+    if not args.pipeline_per_job:
+        pipeline = PersistentPipeline(
+            node_bin=args.node_bin,
+            puppeteer_script=args.puppeteer_script,
+            python_bin=args.python_bin,
+            extract_experience_py=args.extract_experience_py,
+            sigterm_timeout_seconds=args.sigterm_timeout,
+            max_output_bytes=args.max_output_bytes,
+        )
+
+    try:
+        while not stop.is_set():
+            try:
+                with state.transaction():
+                    state.reap_stuck_diffs()
+                    state.reap_stuck_job_tasks()
+                    over_limit = state.mark_over_attempt_limit_job_tasks_failed(args.max_job_attempts)
+                if over_limit:
+                    LOG.warning("job_retry_cap_marked_failed count=%d max_attempts=%d", over_limit, args.max_job_attempts)
+
+                inserted = expand_one_diff(state, owner)
+                if inserted:
+                    LOG.info("expanded_diff inserted_tasks=%d", inserted)
+
+                claimed: Optional[Tuple[str, str]] = state.claim_job_task(
+                    owner=owner,
+                    max_attempts=args.max_job_attempts,
+                )
+            except sqlite3.Error:
+                LOG.exception("db_error reopening db=%s", args.db)
+                state = _reopen(state, args.db)
+                stop.wait(args.poll_sleep_seconds)
+                continue
+
+            if not claimed:
+                stop.wait(args.poll_sleep_seconds)
+                continue
+
+            url, site = claimed
+
+            if should_skip_url(url):
+                LOG.info("job_skipped_invalid_url site=%s url=%s", site, url)
+                try:
+                    state.complete_job_task(url)
+                except sqlite3.Error:
+                    LOG.exception("db_error reopening db=%s", args.db)
+                    state = _reopen(state, args.db)
+                continue
+
+            try:
+                if pipeline is not None:
+                    result = pipeline.run(url=url, timeout_seconds=args.timeout_seconds)
+                else:
+                    result = run_pipeline(
+                        node_bin=args.node_bin,
+                        puppeteer_script=args.puppeteer_script,
+                        python_bin=args.python_bin,
+                        extract_experience_py=args.extract_experience_py,
+                        url=url,
+                        timeout_seconds=args.timeout_seconds,
+                        sigterm_timeout_seconds=args.sigterm_timeout,
+                        max_output_bytes=args.max_output_bytes,
+                    )
+
+                job_title = str(result.get("job_title", "")).strip()
+                min_years = int(result.get("min_years", 0) or 0)
+                include_job = min_years < 4
+                exclude_reason = None if include_job else "min_years_gte_4"
+
+                with state.transaction():
+                    state.upsert_job_details(
+                        url=url,
+                        site=site,
+                        job_title=job_title,
+                        min_years=min_years,
+                        include_job=include_job,
+                        exclude_reason=exclude_reason,
+                        raw_json=result,
+                    )
+                    state.complete_job_task(url)
+
+                LOG.info("job_done owner=%s site=%s min_years=%d title=%s", owner, site, min_years, job_title[:80])
+                if budget.record():
+                    LOG.info("max_jobs_per_run_reached count=%d", budget.done)
+                    stop.set()
+
+            except Exception as e:
+                LOG.exception("job_failed site=%s url=%s", site, url)
+                if isinstance(e, sqlite3.Error):
+                    state = _reopen(state, args.db)
+                try:
+                    state.fail_job_task(url, str(e), backoff_ms=30_000)
+                except sqlite3.Error:
+                    # e.g. still locked out; keep the worker thread alive.
+                    LOG.exception("fail_job_task_error url=%s reopening db=%s", url, args.db)
+                    state = _reopen(state, args.db)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+        state.close()
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--db", default="./state/snapshots.sqlite3")
@@ -193,96 +575,57 @@ def main() -> None:
     ap.add_argument("--python-bin", default="python")
     ap.add_argument("--extract-experience-py", required=True)
     ap.add_argument("--timeout-seconds", type=int, default=120)
+    ap.add_argument(
+        "--sigterm-timeout",
+        type=float,
+        default=DEFAULT_SIGTERM_TIMEOUT_SECONDS,
+        help="Seconds a timed-out pipeline gets after SIGTERM before SIGKILL",
+    )
+    ap.add_argument(
+        "--max-output-bytes",
+        type=int,
+        default=DEFAULT_MAX_OUTPUT_BYTES,
+        help="Largest extract_experience result line accepted before the job is aborted",
+    )
     ap.add_argument("--poll-sleep-seconds", type=int, default=2)
     ap.add_argument("--max-job-attempts", type=int, default=3)
     ap.add_argument("--max-jobs-per-run", type=int, default=0, help="0 means infinite loop")
+    ap.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Jobs run concurrently, each with its own scraper and extractor",
+    )
+    ap.add_argument(
+        "--pipeline-per-job",
+        action="store_true",
+        help="Spawn node | python for every job instead of keeping both running",
+    )
     ap.add_argument("--verbose", action="store_true")
     args = ap.parse_args()
 
     setup_logging(args.verbose)
     owner = f"{socket.gethostname()}:{os.getpid()}"
-    LOG.info("inference_worker_start owner=%s db=%s", owner, args.db)
-
-    processed = 0
-    while True:
-        state = SQLiteState(args.db)
-
+    LOG.info("inference_worker_start owner=%s db=%s max_workers=%d", owner, args.db, args.max_workers)
+
+    # SIGTERM unwinds like Ctrl-C: the main thread tells the workers to stop,
+    # and each closes its pipeline and connection once its current job ends.
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+
+    stop = threading.Event()
+    budget = _JobBudget(args.max_jobs_per_run)
+    with ThreadPoolExecutor(max_workers=args.max_workers, thread_name_prefix="inference") as ex:
+        futures = [
+            ex.submit(worker_loop, args=args, owner=f"{owner}:{tid}", stop=stop, budget=budget)
+            for tid in range(args.max_workers)
+        ]
         try:
-            state.reap_stuck_diffs()
-            state.reap_stuck_job_tasks()
-            over_limit = state.mark_over_attempt_limit_job_tasks_failed(args.max_job_attempts)
-            if over_limit:
-                LOG.warning("job_retry_cap_marked_failed count=%d max_attempts=%d", over_limit, args.max_job_attempts)
-
-            inserted = expand_one_diff(state, owner)
-            if inserted:
-                LOG.info("expanded_diff inserted_tasks=%d", inserted)
-
-            claimed: Optional[Tuple[str, str]] = state.claim_job_task(
-                owner=owner,
-                max_attempts=args.max_job_attempts,
-            )
-            if not claimed:
-                state.close()
-                time.sleep(args.poll_sleep_seconds)
-                continue
-
-            url, site = claimed
+            for fut in as_completed(futures):
+                # A worker only returns early on an unexpected error: stop the rest.
+                stop.set()
+                fut.result()
         finally:
-            try:
-                state.close()
-            except Exception:
-                pass
-
-        if should_skip_url(url):
-            LOG.info("job_skipped_invalid_url site=%s url=%s", site, url)
-            state = SQLiteState(args.db)
-            state.complete_job_task(url)
-            state.close()
-            continue
-
-        try:
-            result = run_pipeline(
-                node_bin=args.node_bin,
-                puppeteer_script=args.puppeteer_script,
-                python_bin=args.python_bin,
-                extract_experience_py=args.extract_experience_py,
-                url=url,
-                timeout_seconds=args.timeout_seconds,
-            )
-
-            job_title = str(result.get("job_title", "")).strip()
-            min_years = int(result.get("min_years", 0) or 0)
-            include_job = min_years < 4
-            exclude_reason = None if include_job else "min_years_gte_4"
-
-            state = SQLiteState(args.db)
-            state.upsert_job_details(
-                url=url,
-                site=site,
-                job_title=job_title,
-                min_years=min_years,
-                include_job=include_job,
-                exclude_reason=exclude_reason,
-                raw_json=result,
-            )
-            state.complete_job_task(url)
-            state.close()
-
-            processed += 1
-            LOG.info("job_done site=%s min_years=%d title=%s", site, min_years, job_title[:80])
-
-        except Exception as e:
-            LOG.exception("job_failed site=%s url=%s", site, url)
-            state = SQLiteState(args.db)
-            state.fail_job_task(url, str(e), backoff_ms=30_000)
-            state.close()
-
-        if args.max_jobs_per_run and processed >= args.max_jobs_per_run:
-            LOG.info("max_jobs_per_run_reached count=%d", processed)
-            return
-
+            stop.set()
 
 if __name__ == "__main__":
     main()
-    
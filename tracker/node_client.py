@@ -1,13 +1,16 @@
 # tracker/node_client.py
 from __future__ import annotations
 
+import asyncio
 import subprocess
+import threading
 from dataclasses import dataclass
 from typing import List
 
 
 @dataclass(frozen=True)
 class NodeCallResult:
+    # links: deduped, in the order node first printed them.
     links: List[str]
     raw_stdout: str
     raw_stderr: str
@@ -24,27 +27,95 @@ def fetch_links_via_node(
     """
     Calls your Node extractor CLI and returns links as a list.
     Expects index.js to print one link per line.
+
+    Lines are deduped as node prints them, so the full stdout is never held
+    in memory; raw_stdout is therefore empty. On timeout node is killed and
+    subprocess.TimeoutExpired is raised, as subprocess.run does.
     """
-    proc = subprocess.run(
-        [node_bin, "index.js", url],
+    args = [node_bin, "index.js", url]
+    proc = subprocess.Popen(
+        args,
         cwd=node_workdir,
-        capture_output=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
         text=True,
-        timeout=timeout_seconds,
+        bufsize=1,
     )
+    # stderr is drained on its own thread so a chatty node cannot block on it.
+    err_parts: List[str] = []
+    drain = threading.Thread(target=lambda: err_parts.append(proc.stderr.read()), daemon=True)
+    drain.start()
+
+    timed_out = threading.Event()
+
+    def kill_on_timeout() -> None:
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout_seconds, kill_on_timeout)
+    timer.start()
+    try:
+        with proc.stdout:
+            # dict keeps first-seen order; fromkeys dedupes in C as lines arrive.
+            links = list(dict.fromkeys(s for s in (line.strip() for line in proc.stdout) if s))
+        proc.wait()
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    drain.join()
+    proc.stderr.close()
+    stderr = "".join(err_parts)
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(args, timeout_seconds, stderr=stderr)
 
-    stdout = proc.stdout or ""
-    stderr = proc.stderr or ""
+    return NodeCallResult(links=links, raw_stdout="", raw_stderr=stderr, returncode=proc.returncode)
+
+
+async def fetch_links_via_node_async(
+    *,
+    node_bin: str,
+    node_workdir: str,
+    url: str,
+    timeout_seconds: int = 120,
+) -> NodeCallResult:
+    """
+    fetch_links_via_node for an event loop: many extractors can run from one
+    thread. On timeout or cancellation the node process is killed; a timeout
+    raises subprocess.TimeoutExpired, as subprocess.run does.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        node_bin,
+        "index.js",
+        url,
+        cwd=node_workdir,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout_seconds)
+    except BaseException as e:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        if isinstance(e, asyncio.TimeoutError):
+            raise subprocess.TimeoutExpired([node_bin, "index.js", url], timeout_seconds) from None
+        raise
+
+    return _node_call_result(
+        out.decode("utf-8", errors="replace"),
+        err.decode("utf-8", errors="replace"),
+        proc.returncode,
+    )
 
-    links: List[str] = []
-    for line in stdout.splitlines():
-        s = line.strip()
-        if s:
-            links.append(s)
 
+def _node_call_result(stdout: str, stderr: str, returncode: int) -> NodeCallResult:
+    links = list(dict.fromkeys(s for s in (line.strip() for line in stdout.splitlines()) if s))
     return NodeCallResult(
         links=links,
         raw_stdout=stdout,
         raw_stderr=stderr,
-        returncode=proc.returncode,
+        returncode=returncode,
     )
@@ -2,15 +2,20 @@
 
 from __future__ import annotations
 
+import itertools
 import json
 import logging
+import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from dataclasses import dataclass
-from typing import List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Set
 
-from tracker.diffing import dedupe_preserve_order, sha256_hex, stable_json_dumps
-from tracker.node_client import fetch_links_via_node
+from tracker.db import SQLiteState, SnapshotRow
+from tracker.diffing import DiffPayload, content_hash_lines, diff_links
+from tracker.node_client import NodeCallResult, fetch_links_via_node, fetch_links_via_node_async
 
 LOG = logging.getLogger("tracker.run_common")
 
@@ -35,8 +40,233 @@ def setup_logging(verbosity: int = 0) -> None:
     logging.getLogger("asyncio").setLevel(logging.WARNING)
 
 
-def snapshot_hash_for_links(links: List[str]) -> str:
-    return sha256_hex(stable_json_dumps(links))
+def snapshot_hash_for_links(links: Iterable[str]) -> bytes:
+    # Newline-joined links; links never contain newlines, so this is unambiguous.
+    return content_hash_lines(links)
+
+
+@dataclass(frozen=True)
+class LinkDelta:
+    old_link_count: int
+    added: Set[str]
+    removed: Set[str]
+    snapshot_hash: bytes
+
+
+def compute_link_delta(
+    *,
+    state: SQLiteState,
+    site: str,
+    new_links: List[str],
+) -> LinkDelta:
+    """
+    Diffs new_links against the site's current snapshot.
+
+    The stored snapshot_hash is checked first: when it matches, the page is
+    unchanged and the old link list is neither loaded nor diffed.
+    """
+    new_hash = snapshot_hash_for_links(new_links)
+    if state.get_current_snapshot_hash(site) == new_hash:
+        return LinkDelta(old_link_count=len(new_links), added=set(), removed=set(), snapshot_hash=new_hash)
+
+    old_links = state.get_current_links(site) or []
+    added, removed = diff_links(old_links, new_links)
+    return LinkDelta(old_link_count=len(old_links), added=added, removed=removed, snapshot_hash=new_hash)
+
+
+@dataclass(frozen=True)
+class CompanyWrite:
+    # result_index: the company's position in the runner's results list.
+    result_index: int
+    snapshot: SnapshotRow
+    diff: Optional[DiffPayload]
+
+
+class WriteBatch:
+    """
+    Snapshot and diff rows of finished companies, held in memory and written
+    `size` companies at a time in one short transaction.
+
+    Nothing is written while a company is being fetched, so the SQLite write
+    lock is never held across a node call and other services sharing the db
+    (inference, email) are not locked out.
+    """
+
+    def __init__(self, state: SQLiteState, size: int, log: Optional[logging.Logger] = None):
+        self.state = state
+        self.size = max(1, size)
+        self.log = log or LOG
+        self._rows: List[CompanyWrite] = []
+
+    def add(self, row: CompanyWrite) -> bool:
+        """Queues row; True once `size` rows are waiting and flush() is due."""
+        self._rows.append(row)
+        return len(self._rows) >= self.size
+
+    def flush(self) -> List[int]:
+        """
+        Writes every queued row. Returns the result_index of each row that
+        could not be written (all of them, if the transaction failed).
+        """
+        rows, self._rows = self._rows, []
+        if not rows:
+            return []
+        diffs = [r.diff for r in rows if r.diff is not None]
+        try:
+            with self.state.transaction():
+                enqueued = self.state.enqueue_diffs(diffs)
+                self.state.upsert_snapshots([r.snapshot for r in rows])
+        except Exception:
+            self.log.exception("batch_write_failed companies=%d", len(rows))
+            return [r.result_index for r in rows]
+        self.log.info("batch_written companies=%d diffs=%d diffs_enqueued=%d", len(rows), len(diffs), enqueued)
+        return []
+
+
+class NodeWorker:
+    """
+    One long-lived `node index.js --server` process shared by many threads.
+
+    Protocol
+    - request: one JSON line {id, url, timeout_ms} on stdin
+    - response: one JSON line {id, links, node_ms} or {id, error, node_ms} on stdout
+    - responses can arrive out of order; a reader thread resolves them by id
+    - cancel: {id, cancel: true}, sent when a call times out here, so the
+      server aborts that request and closes its browser
+
+    The server also enforces timeout_ms itself and caps how many requests run
+    at once (LINK_SERVER_MAX_CONCURRENCY). If the node process dies, pending
+    calls fail and the next call starts a fresh process.
+    """
+
+    def __init__(self, *, node_bin: str, node_workdir: str, log: Optional[logging.Logger] = None):
+        self.node_bin = node_bin
+        self.node_workdir = node_workdir
+        self.log = log or LOG
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._proc: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "NodeWorker":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _start_locked(self) -> subprocess.Popen:
+        proc = subprocess.Popen(
+            [self.node_bin, "index.js", "--server"],
+            cwd=self.node_workdir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_stdout, args=(proc,), name="node-worker-stdout", daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(proc,), name="node-worker-stderr", daemon=True).start()
+        self.log.info("node_worker_started pid=%d workdir=%s", proc.pid, self.node_workdir)
+        return proc
+
+    def _read_stdout(self, proc: subprocess.Popen) -> None:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                self.log.warning("node_worker_bad_line line=%s", line[:200])
+                continue
+
+            with self._lock:
+                fut = self._pending.pop(msg.get("id"), None)
+            if fut is None:
+                continue
+
+            error = msg.get("error")
+            if error:
+                fut.set_result(NodeCallResult(links=[], raw_stdout="", raw_stderr=str(error), returncode=1))
+                continue
+
+            raw_links = msg.get("links") or []
+            links = list(dict.fromkeys(s for s in (r.strip() for r in raw_links if isinstance(r, str)) if s))
+            fut.set_result(
+                NodeCallResult(links=links, raw_stdout="\n".join(links), raw_stderr="", returncode=0)
+            )
+
+        rc = proc.wait()
+        with self._lock:
+            if self._proc is proc:
+                self._proc = None
+            pending = list(self._pending.values())
+            self._pending.clear()
+        if pending:
+            self.log.error("node_worker_exited pid=%d returncode=%s pending=%d", proc.pid, rc, len(pending))
+        for fut in pending:
+            fut.set_exception(RuntimeError(f"Node worker exited returncode={rc}"))
+
+    def _read_stderr(self, proc: subprocess.Popen) -> None:
+        assert proc.stderr is not None
+        for line in proc.stderr:
+            if self.log.isEnabledFor(logging.DEBUG):
+                self.log.debug("node_worker_stderr pid=%d %s", proc.pid, line.rstrip())
+
+    def fetch_links(self, *, url: str, timeout_seconds: int) -> NodeCallResult:
+        fut: Future = Future()
+        with self._lock:
+            if self._proc is None:
+                self._proc = self._start_locked()
+            req_id = next(self._ids)
+            self._pending[req_id] = fut
+            try:
+                assert self._proc.stdin is not None
+                self._proc.stdin.write(
+                    json.dumps({"id": req_id, "url": url, "timeout_ms": timeout_seconds * 1000}) + "\n"
+                )
+                self._proc.stdin.flush()
+            except OSError as e:
+                self._pending.pop(req_id, None)
+                raise RuntimeError(f"Node worker write failed error={e}") from e
+
+        try:
+            return fut.result(timeout=timeout_seconds)
+        except FutureTimeoutError:
+            self._cancel(req_id)
+            raise TimeoutError(f"Node worker timed out url={url} timeout_seconds={timeout_seconds}")
+
+    def _cancel(self, req_id: int) -> None:
+        # The server's own timeout_ms should already have fired; this frees
+        # the page now in case it has not.
+        with self._lock:
+            self._pending.pop(req_id, None)
+            proc = self._proc
+            if proc is None or proc.stdin is None:
+                return
+            try:
+                proc.stdin.write(json.dumps({"id": req_id, "cancel": True}) + "\n")
+                proc.stdin.flush()
+            except OSError as e:
+                self.log.warning("node_worker_cancel_failed id=%d error=%s", req_id, e)
+
+    def close(self, timeout_seconds: int = 30) -> None:
+        with self._lock:
+            proc = self._proc
+            self._proc = None
+        if proc is None:
+            return
+        try:
+            # EOF on stdin lets the server drain in-flight requests and exit.
+            if proc.stdin:
+                proc.stdin.close()
+            proc.wait(timeout=timeout_seconds)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        except OSError:
+            pass
 
 
 @dataclass(frozen=True)
@@ -54,31 +284,71 @@ def fetch_links_or_raise(
     node_workdir: str,
     timeout_seconds: int,
     log: Optional[logging.Logger] = None,
+    node_worker: Optional[NodeWorker] = None,
 ) -> NodeFetchLinksResult:
     """
     Calls Node extractor and returns deduped links.
+    Uses node_worker when given, otherwise spawns one node process for this URL.
     Raises RuntimeError on nonzero return code.
     """
     if log is None:
         log = LOG
 
     node_t0 = time.perf_counter()
-    node_result = fetch_links_via_node(
+    if node_worker is not None:
+        node_result = node_worker.fetch_links(url=url, timeout_seconds=timeout_seconds)
+    else:
+        node_result = fetch_links_via_node(
+            node_bin=node_bin,
+            node_workdir=node_workdir,
+            url=url,
+            timeout_seconds=timeout_seconds,
+        )
+    node_ms = int((time.perf_counter() - node_t0) * 1000)
+    return _check_node_result(url=url, node_result=node_result, node_ms=node_ms, log=log)
+
+
+async def fetch_links_or_raise_async(
+    *,
+    url: str,
+    node_bin: str,
+    node_workdir: str,
+    timeout_seconds: int,
+    log: Optional[logging.Logger] = None,
+) -> NodeFetchLinksResult:
+    """
+    fetch_links_or_raise for an event loop; always spawns one node process.
+    """
+    if log is None:
+        log = LOG
+
+    node_t0 = time.perf_counter()
+    node_result = await fetch_links_via_node_async(
         node_bin=node_bin,
         node_workdir=node_workdir,
         url=url,
         timeout_seconds=timeout_seconds,
     )
     node_ms = int((time.perf_counter() - node_t0) * 1000)
+    return _check_node_result(url=url, node_result=node_result, node_ms=node_ms, log=log)
 
-    log.debug(
-        "node_result url=%s returncode=%s node_ms=%d stdout_bytes=%d stderr_bytes=%d",
-        url,
-        node_result.returncode,
-        node_ms,
-        len(node_result.raw_stdout or ""),
-        len(node_result.raw_stderr or ""),
-    )
+
+def _check_node_result(
+    *,
+    url: str,
+    node_result: NodeCallResult,
+    node_ms: int,
+    log: logging.Logger,
+) -> NodeFetchLinksResult:
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(
+            "node_result url=%s returncode=%s node_ms=%d link_count=%d stderr_bytes=%d",
+            url,
+            node_result.returncode,
+            node_ms,
+            len(node_result.links),
+            len(node_result.raw_stderr),
+        )
 
     if node_result.returncode != 0:
         stderr_preview = (node_result.raw_stderr or "").strip().replace("\n", "\\n")[:1000]
@@ -95,15 +365,15 @@ def fetch_links_or_raise(
             + f"stderr={node_result.raw_stderr}"
         )
 
-    links = dedupe_preserve_order(node_result.links)
+    # Every NodeCallResult producer already dedupes.
     return NodeFetchLinksResult(
-        links=links,
+        links=node_result.links,
         raw_stdout=node_result.raw_stdout or "",
         raw_stderr=node_result.raw_stderr or "",
         node_ms=node_ms,
     )
 
 
-def json_sample(values: Sequence[str], n: int = 10) -> str:
-    # Accept any iterable (including sets) and take a stable slice.
-    return json.dumps(list(values)[:n])
+def json_sample(values: Iterable[str], n: int = 10) -> str:
+    # Accept any iterable (including sets); islice takes n without copying the rest.
+    return json.dumps(list(itertools.islice(values, n)))
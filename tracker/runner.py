@@ -4,17 +4,11 @@ from __future__ import annotations
 import argparse
 import json
 from dataclasses import dataclass
-from typing import List
 
 from tracker.db import SQLiteState, SnapshotRow, now_epoch_ms
-from tracker.diffing import (
-    build_diff_payload,
-    dedupe_preserve_order,
-    diff_links,
-    sha256_hex,
-    stable_json_dumps,
-)
+from tracker.diffing import build_diff_payload
 from tracker.node_client import fetch_links_via_node
+from tracker.run_common import compute_link_delta
 
 
 @dataclass(frozen=True)
@@ -28,10 +22,6 @@ class RunSummary:
     diff_enqueued: bool
 
 
-def snapshot_hash_for_links(links: List[str]) -> str:
-    return sha256_hex(stable_json_dumps(links))
-
-
 def run_once(
     *,
     site: str,
@@ -41,10 +31,7 @@ def run_once(
     node_bin: str,
     node_timeout_seconds: int,
 ) -> RunSummary:
-    state = SQLiteState(db_path)
-    try:
-        old_links = state.get_current_links(site) or []
-
+    with SQLiteState(db_path) as state:
         node_result = fetch_links_via_node(
             node_bin=node_bin,
             node_workdir=node_workdir,
@@ -58,40 +45,36 @@ def run_once(
                 + f"stderr={node_result.raw_stderr}"
             )
 
-        new_links = dedupe_preserve_order(node_result.links)
+        # fetch_links_via_node already deduped, in first-seen order.
+        new_links = node_result.links
 
-        added_links, _removed_links = diff_links(old_links, new_links)
+        delta = compute_link_delta(state=state, site=site, new_links=new_links)
+        added_links = delta.added
 
         diff_payload = build_diff_payload(site, added_links)
 
-        diff_enqueued = False
-        if diff_payload.added_urls:
-            diff_enqueued = state.enqueue_diff(
-                site=site,
-                diff_hash=diff_payload.diff_hash,
-                added_urls=diff_payload.added_urls,
-            )
-
         snapshot = SnapshotRow(
             site=site,
             url=url,
             ts_ms=now_epoch_ms(),
-            snapshot_hash=snapshot_hash_for_links(new_links),
+            snapshot_hash=delta.snapshot_hash,
             links=new_links,
         )
-        state.upsert_snapshot(snapshot)
+
+        # Diff and snapshot land together, in one short transaction after the fetch.
+        with state.transaction():
+            diff_enqueued = state.enqueue_diffs([diff_payload] if diff_payload.added_urls else []) > 0
+            state.upsert_snapshot(snapshot)
 
         return RunSummary(
             site=site,
             url=url,
-            old_link_count=len(old_links),
+            old_link_count=delta.old_link_count,
             new_link_count=len(new_links),
             added_link_count=len(added_links),
             snapshot_written=True,
             diff_enqueued=diff_enqueued,
         )
-    finally:
-        state.close()
 
 
 def main() -> None:
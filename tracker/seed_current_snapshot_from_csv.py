@@ -21,13 +21,14 @@ import json
 import logging
 import sys
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from tracker.config_loader import CompanyTarget, load_company_targets_csv
 from tracker.db import SQLiteState, SnapshotRow, now_epoch_ms
 from tracker.run_common import fetch_links_or_raise, setup_logging, snapshot_hash_for_links
 
 LOG = logging.getLogger("tracker.seed")
+SNAPSHOT_BATCH_SIZE = 32
 
 
 @dataclass(frozen=True)
@@ -51,10 +52,12 @@ def seed_current_snapshot_from_csv(
     clear_current_snapshot_first: bool,
     stop_on_error: bool,
 ) -> dict:
-    targets: List[CompanyTarget] = load_company_targets_csv(csv_path)
+    targets: Tuple[CompanyTarget, ...] = load_company_targets_csv(csv_path)
     state = SQLiteState(db_path)
 
     results: List[SeedResult] = []
+    # Written SNAPSHOT_BATCH_SIZE at a time, one commit per batch.
+    pending: List[SnapshotRow] = []
     ok_count = 0
     fail_count = 0
 
@@ -84,7 +87,8 @@ def seed_current_snapshot_from_csv(
                     links=node.links,
                 )
 
-                state.upsert_snapshot(snapshot)
+                pending.append(snapshot)
+                hash_hex = snapshot.snapshot_hash.hex()
 
                 ok_count += 1
                 results.append(
@@ -94,7 +98,7 @@ def seed_current_snapshot_from_csv(
                         ok=True,
                         error=None,
                         link_count=len(node.links),
-                        snapshot_hash=snapshot.snapshot_hash,
+                        snapshot_hash=hash_hex,
                         node_ms=node.node_ms,
                     )
                 )
@@ -104,7 +108,7 @@ def seed_current_snapshot_from_csv(
                     t.company,
                     node.node_ms,
                     len(node.links),
-                    snapshot.snapshot_hash,
+                    hash_hex,
                 )
 
             except Exception as e:
@@ -127,8 +131,16 @@ def seed_current_snapshot_from_csv(
                     LOG.error("stop_on_error=true stopping_seed")
                     break
 
+            if len(pending) >= SNAPSHOT_BATCH_SIZE:
+                state.upsert_snapshots(pending)
+                pending.clear()
+
     finally:
-        state.close()
+        try:
+            # Also on Ctrl-C or a failure: keep every snapshot already fetched.
+            state.upsert_snapshots(pending)
+        finally:
+            state.close()
 
     return {
         "csv_path": csv_path,
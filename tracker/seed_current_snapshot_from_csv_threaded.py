@@ -9,8 +9,9 @@ For each company URL:
 - Writes a full replacement snapshot for that company
 - Does NOT compute diffs or enqueue jobs
 
-Supports parallel fetching with a bounded thread pool.
-SQLite writes are serialized for safety.
+Supports parallel fetching: node extractors run concurrently on one asyncio
+event loop, at most --max-workers at a time.
+SQLite writes happen on one writer thread, committed in batches.
 
 USAGE:
 
@@ -41,7 +42,7 @@ FLAGS:
     Per-company timeout for Node extraction (default: 180)
 
 --max-workers N
-    Number of parallel worker threads (default: 4)
+    Number of node extractors run at once (default: 4)
 
 --clear-current-snapshot-first
     If set, DELETE FROM current_snapshot before seeding
@@ -56,19 +57,22 @@ FLAGS:
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import logging
+import queue
 import sys
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from typing import List, Optional, Tuple
 
 from tracker.config_loader import CompanyTarget, load_company_targets_csv
 from tracker.db import SQLiteState, SnapshotRow, now_epoch_ms
-from tracker.run_common import fetch_links_or_raise, setup_logging, snapshot_hash_for_links
+from tracker.run_common import fetch_links_or_raise_async, setup_logging, snapshot_hash_for_links
 
 LOG = logging.getLogger("tracker.seed")
+SNAPSHOT_BATCH_SIZE = 32
+WRITE_QUEUE_SIZE = 256
 
 
 @dataclass(frozen=True)
@@ -81,6 +85,55 @@ class SeedResult:
     snapshot_hash: str
 
 
+class SnapshotWriter:
+    """
+    Single writer for one SQLiteState: the event loop queues snapshots and a
+    dedicated thread commits them up to SNAPSHOT_BATCH_SIZE per transaction,
+    so SQLite never blocks the loop. A failed batch is logged and counted;
+    the writer keeps draining so producers never stall on a full queue.
+    """
+
+    def __init__(self, state: SQLiteState):
+        self.state = state
+        self.failed = 0
+        self._q: "queue.Queue[Optional[SnapshotRow]]" = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="seed-writer", daemon=True)
+        self._thread.start()
+
+    async def put(self, snapshot: SnapshotRow) -> None:
+        try:
+            self._q.put_nowait(snapshot)
+        except queue.Full:
+            # Back-pressure without blocking the loop.
+            await asyncio.to_thread(self._q.put, snapshot)
+
+    def _run(self) -> None:
+        done = False
+        while not done:
+            batch = [self._q.get()]
+            # Linger briefly so a burst of completions shares one commit.
+            while len(batch) < SNAPSHOT_BATCH_SIZE and batch[-1] is not None:
+                try:
+                    batch.append(self._q.get(timeout=0.5))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                done = True
+                batch.pop()
+            if not batch:
+                continue
+            try:
+                self.state.upsert_snapshots(batch)
+            except Exception:
+                self.failed += len(batch)
+                LOG.exception("seed_write_failed count=%d", len(batch))
+
+    def close(self) -> None:
+        """Commits everything queued so far, then stops the thread."""
+        self._q.put(None)
+        self._thread.join()
+
+
 def seed_current_snapshot_from_csv(
     *,
     csv_path: str,
@@ -92,37 +145,65 @@ def seed_current_snapshot_from_csv(
     stop_on_error: bool,
     max_workers: int,
 ) -> dict:
-    targets: List[CompanyTarget] = load_company_targets_csv(csv_path)
+    return asyncio.run(
+        _seed_async(
+            csv_path=csv_path,
+            db_path=db_path,
+            node_workdir=node_workdir,
+            node_bin=node_bin,
+            node_timeout_seconds=node_timeout_seconds,
+            clear_current_snapshot_first=clear_current_snapshot_first,
+            stop_on_error=stop_on_error,
+            max_workers=max_workers,
+        )
+    )
+
+
+async def _seed_async(
+    *,
+    csv_path: str,
+    db_path: str,
+    node_workdir: str,
+    node_bin: str,
+    node_timeout_seconds: int,
+    clear_current_snapshot_first: bool,
+    stop_on_error: bool,
+    max_workers: int,
+) -> dict:
+    targets: Tuple[CompanyTarget, ...] = load_company_targets_csv(csv_path)
     state = SQLiteState(db_path)
-    db_lock = threading.Lock()
+    sem = asyncio.Semaphore(max_workers)
 
     results: List[SeedResult] = []
+    writer: Optional[SnapshotWriter] = None
     ok_count = 0
     fail_count = 0
 
     try:
         if clear_current_snapshot_first:
-            with db_lock:
-                LOG.info("clear_current_snapshot_first=true deleting_current_snapshot")
-                state.conn.execute("DELETE FROM current_snapshot;")
-                state.conn.commit()
-
-        def worker(t: CompanyTarget) -> Tuple[CompanyTarget, List[str], int]:
-            node = fetch_links_or_raise(
-                url=t.url,
-                node_bin=node_bin,
-                node_workdir=node_workdir,
-                timeout_seconds=node_timeout_seconds,
-                log=LOG,
-            )
+            LOG.info("clear_current_snapshot_first=true deleting_current_snapshot")
+            state.conn.execute("DELETE FROM current_snapshot;")
+            state.conn.commit()
+
+        # From here on only the writer thread touches `state`.
+        writer = SnapshotWriter(state)
+
+        async def worker(t: CompanyTarget) -> Tuple[CompanyTarget, List[str], int]:
+            async with sem:
+                node = await fetch_links_or_raise_async(
+                    url=t.url,
+                    node_bin=node_bin,
+                    node_workdir=node_workdir,
+                    timeout_seconds=node_timeout_seconds,
+                    log=LOG,
+                )
             return t, node.links, node.node_ms
 
-        with ThreadPoolExecutor(max_workers=max_workers) as ex:
-            futures = [ex.submit(worker, t) for t in targets]
-
-            for fut in as_completed(futures):
+        tasks = [asyncio.ensure_future(worker(t)) for t in targets]
+        try:
+            for fut in asyncio.as_completed(tasks):
                 try:
-                    t, links, node_ms = fut.result()
+                    t, links, node_ms = await fut
 
                     snapshot = SnapshotRow(
                         site=t.company,
@@ -132,8 +213,8 @@ def seed_current_snapshot_from_csv(
                         links=links,
                     )
 
-                    with db_lock:
-                        state.upsert_snapshot(snapshot)
+                    await writer.put(snapshot)
+                    hash_hex = snapshot.snapshot_hash.hex()
 
                     ok_count += 1
                     results.append(
@@ -143,7 +224,7 @@ def seed_current_snapshot_from_csv(
                             ok=True,
                             error=None,
                             link_count=len(links),
-                            snapshot_hash=snapshot.snapshot_hash,
+                            snapshot_hash=hash_hex,
                         )
                     )
 
@@ -152,7 +233,7 @@ def seed_current_snapshot_from_csv(
                         t.company,
                         node_ms,
                         len(links),
-                        snapshot.snapshot_hash,
+                        hash_hex,
                     )
 
                 except Exception as e:
@@ -172,12 +253,20 @@ def seed_current_snapshot_from_csv(
 
                     if stop_on_error:
                         LOG.error("stop_on_error=true cancelling_pending")
-                        for f in futures:
-                            f.cancel()
                         break
+        finally:
+            # Cancelling kills any node process still running for a task.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     finally:
-        state.close()
+        try:
+            # Also on Ctrl-C or a failure: keep every snapshot already fetched.
+            if writer is not None:
+                writer.close()
+        finally:
+            state.close()
 
     return {
         "csv_path": csv_path,
@@ -186,6 +275,7 @@ def seed_current_snapshot_from_csv(
         "company_count_total": len(targets),
         "company_ok_count": ok_count,
         "company_fail_count": fail_count,
+        "snapshot_write_fail_count": writer.failed if writer is not None else 0,
         "results": [r.__dict__ for r in results],
     }
 
@@ -208,7 +298,7 @@ def main() -> None:
         "--max-workers",
         type=int,
         default=4,
-        help="Thread pool size",
+        help="Max node extractors running at once",
     )
 
     ap.add_argument(